@@ -19,10 +19,15 @@ from app.models.channel import Channel  # noqa: F401
 from app.models.invitation import Invitation  # noqa: F401
 from app.models.message import Message  # noqa: F401
 from app.models.phone_verification import PhoneVerification  # noqa: F401
+from app.models.rate_limit import RateLimitBucket  # noqa: F401
+from app.models.read_marker import ChannelReadMarker  # noqa: F401
+from app.models.message_archive import MessageArchiveSegment  # noqa: F401
+from app.models.broker_payload import BrokerPayload  # noqa: F401
 
 # This tells the linter these imports are intentional
 __all__ = [
-    "User", "Group", "Channel", "Invitation", "Message", "PhoneVerification"
+    "User", "Group", "Channel", "Invitation", "Message", "PhoneVerification", "RateLimitBucket",
+    "ChannelReadMarker", "MessageArchiveSegment", "BrokerPayload"
 ]
 
 from app.config import settings
@@ -50,6 +55,16 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate away from the full-text search objects, which the models do not describe."""
+    if type_ == "table" and name.startswith("messages_fts"):
+        return False
+    if name in ("search_vector", "ix_messages_search_vector"):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -72,6 +87,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -95,7 +111,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,31 @@
+"""Add composite index for channel message history
+
+Revision ID: 9c41d2e7a5b3
+Revises: 3fadb7395c00
+Create Date: 2026-10-17 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41d2e7a5b3'
+down_revision: Union[str, None] = '3fadb7395c00'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_messages_channel_id_created_at_id',
+        'messages',
+        ['channel_id', 'created_at', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_channel_id_created_at_id', table_name='messages')
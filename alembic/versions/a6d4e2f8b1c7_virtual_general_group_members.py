@@ -0,0 +1,89 @@
+"""Make general groups virtual: drop their implied user_group rows, keep leavers as exclusions
+
+Revision ID: a6d4e2f8b1c7
+Revises: f1c3a8d6e2b9
+Create Date: 2026-10-17 21:12:04.318552
+
+"""
+from app.db import types
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d4e2f8b1c7'
+down_revision: Union[str, None] = 'f1c3a8d6e2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+users = sa.table(
+    'users', sa.column('id'), sa.column('email', sa.String),
+    sa.column('is_active', sa.Boolean), sa.column('is_superuser', sa.Boolean)
+)
+invitations = sa.table('invitations', sa.column('invitee_id'), sa.column('is_used', sa.Boolean))
+groups = sa.table('groups', sa.column('id'), sa.column('name', sa.String), sa.column('is_general', sa.Boolean))
+user_group = sa.table('user_group', sa.column('user_id'), sa.column('group_id'))
+exclusions = sa.table('general_group_exclusions', sa.column('group_id'), sa.column('user_id'))
+
+# Every general group except the Demo Lounge, and every active non-demo user
+# who is a superuser or has redeemed an invitation
+virtual_groups = sa.select(groups.c.id).where(groups.c.is_general == sa.true(), groups.c.name != 'Demo Lounge')
+implied_members = sa.select(users.c.id).where(
+    users.c.is_active == sa.true(),
+    sa.not_(users.c.email.like('%@demo.strangers.club')),
+    sa.or_(
+        users.c.is_superuser == sa.true(),
+        sa.exists().where(invitations.c.invitee_id == users.c.id, invitations.c.is_used == sa.true())
+    )
+)
+
+
+def upgrade() -> None:
+    # Implied membership probes invitations by invitee
+    op.create_index('ix_invitations_invitee_id', 'invitations', ['invitee_id'])
+
+    op.create_table(
+        'general_group_exclusions',
+        sa.Column('group_id', types.GUID(), nullable=False),
+        sa.Column('user_id', types.GUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+
+    # Implied members without a row had left the group: they stay out
+    op.execute(
+        exclusions.insert().from_select(
+            ['group_id', 'user_id'],
+            sa.select(groups.c.id, users.c.id)
+            .select_from(users.join(groups, sa.true()))
+            .where(users.c.id.in_(implied_members), groups.c.id.in_(virtual_groups))
+            .where(~sa.exists().where(user_group.c.user_id == users.c.id, user_group.c.group_id == groups.c.id))
+        )
+    )
+
+    # Rows of anyone else (e.g. a demo owner) stay: they are still members
+    op.execute(
+        user_group.delete().where(
+            user_group.c.group_id.in_(virtual_groups),
+            user_group.c.user_id.in_(implied_members)
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invitations_invitee_id', table_name='invitations')
+    op.execute(
+        user_group.insert().from_select(
+            ['user_id', 'group_id'],
+            sa.select(users.c.id, groups.c.id)
+            .select_from(users.join(groups, sa.true()))
+            .where(users.c.id.in_(implied_members), groups.c.id.in_(virtual_groups))
+            .where(~sa.exists().where(user_group.c.user_id == users.c.id, user_group.c.group_id == groups.c.id))
+            .where(~sa.exists().where(exclusions.c.user_id == users.c.id, exclusions.c.group_id == groups.c.id))
+        )
+    )
+    op.drop_table('general_group_exclusions')
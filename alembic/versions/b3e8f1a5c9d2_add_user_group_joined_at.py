@@ -0,0 +1,48 @@
+"""Add user_group.joined_at and indexes for paginated member listing
+
+Revision ID: b3e8f1a5c9d2
+Revises: a6d4e2f8b1c7
+Create Date: 2026-10-17 22:31:47.905216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f1a5c9d2'
+down_revision: Union[str, None] = 'a6d4e2f8b1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite cannot ADD COLUMN with a CURRENT_TIMESTAMP default, so the table is rebuilt there
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+    with op.batch_alter_table('user_group', recreate=recreate) as batch_op:
+        batch_op.add_column(
+            sa.Column('joined_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True)
+        )
+
+    # Existing memberships began no earlier than the later of the user's signup and the group's creation
+    op.execute("""
+        UPDATE user_group SET joined_at = (
+            SELECT CASE WHEN users.created_at > groups.created_at THEN users.created_at ELSE groups.created_at END
+            FROM users, groups
+            WHERE users.id = user_group.user_id AND groups.id = user_group.group_id
+        )
+    """)
+
+    op.drop_index('ix_user_group_group_id', table_name='user_group')
+    op.create_index('ix_user_group_group_id_joined_at', 'user_group', ['group_id', 'joined_at', 'user_id'])
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_user_group_group_id_joined_at', table_name='user_group')
+    op.create_index('ix_user_group_group_id', 'user_group', ['group_id'])
+    with op.batch_alter_table('user_group') as batch_op:
+        batch_op.drop_column('joined_at')
@@ -0,0 +1,70 @@
+"""Add full-text search index over message content
+
+Revision ID: c5d8e1f3a7b2
+Revises: b7e2f04c1d9a
+Create Date: 2026-10-17 15:02:11.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8e1f3a7b2'
+down_revision: Union[str, None] = 'b7e2f04c1d9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # A generated column stays in sync with content on every insert,
+        # update and delete without triggers. 'simple' does no stemming,
+        # like the SQLite tokenizer, so both backends match the same words.
+        op.execute(
+            "ALTER TABLE messages ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED"
+        )
+        op.execute("CREATE INDEX ix_messages_search_vector ON messages USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        # External-content FTS5 table keyed by the messages rowid, kept in
+        # sync by triggers. VACUUM can renumber rowids of tables without an
+        # INTEGER PRIMARY KEY; run
+        #   INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')
+        # afterwards if the development database is ever vacuumed.
+        op.execute(
+            "CREATE VIRTUAL TABLE messages_fts USING fts5("
+            "content, content='messages', content_rowid='rowid', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN "
+            "INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN "
+            "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER messages_fts_au AFTER UPDATE OF content ON messages BEGIN "
+            "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content); "
+            "INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content); "
+            "END"
+        )
+        op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_messages_search_vector', table_name='messages')
+        op.drop_column('messages', 'search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('messages_fts_ai', 'messages_fts_ad', 'messages_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS messages_fts")
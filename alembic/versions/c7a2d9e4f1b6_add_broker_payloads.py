@@ -0,0 +1,32 @@
+"""Add broker_payloads table for events too large for NOTIFY
+
+Revision ID: c7a2d9e4f1b6
+Revises: b3e8f1a5c9d2
+Create Date: 2026-10-18 09:14:52.207618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a2d9e4f1b6'
+down_revision: Union[str, None] = 'b3e8f1a5c9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'broker_payloads',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('broker_payloads')
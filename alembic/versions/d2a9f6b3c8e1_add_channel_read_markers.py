@@ -0,0 +1,37 @@
+"""Add channel_read_markers table for per-user read positions
+
+Revision ID: d2a9f6b3c8e1
+Revises: c5d8e1f3a7b2
+Create Date: 2026-10-17 16:40:27.804451
+
+"""
+from app.db import types
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a9f6b3c8e1'
+down_revision: Union[str, None] = 'c5d8e1f3a7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'channel_read_markers',
+        sa.Column('user_id', types.GUID(), nullable=False),
+        sa.Column('channel_id', types.GUID(), nullable=False),
+        sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_read_message_id', types.GUID(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'channel_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('channel_read_markers')
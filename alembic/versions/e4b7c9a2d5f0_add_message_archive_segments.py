@@ -0,0 +1,48 @@
+"""Add message_archive_segments table for archived channel history
+
+Revision ID: e4b7c9a2d5f0
+Revises: d2a9f6b3c8e1
+Create Date: 2026-10-17 18:12:45.219307
+
+"""
+from app.db import types
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c9a2d5f0'
+down_revision: Union[str, None] = 'd2a9f6b3c8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'message_archive_segments',
+        sa.Column('id', types.GUID(), nullable=False),
+        sa.Column('channel_id', types.GUID(), nullable=False),
+        sa.Column('first_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('first_message_id', types.GUID(), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_message_id', types.GUID(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('author_ids', sa.Text(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_message_archive_segments_channel_id_first',
+        'message_archive_segments',
+        ['channel_id', 'first_created_at', 'first_message_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_message_archive_segments_channel_id_first', table_name='message_archive_segments')
+    op.drop_table('message_archive_segments')
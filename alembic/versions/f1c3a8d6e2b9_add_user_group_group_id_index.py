@@ -0,0 +1,26 @@
+"""Index user_group by group_id
+
+Revision ID: f1c3a8d6e2b9
+Revises: e4b7c9a2d5f0
+Create Date: 2026-10-17 19:05:38.641027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c3a8d6e2b9'
+down_revision: Union[str, None] = 'e4b7c9a2d5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_group_group_id', 'user_group', ['group_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_group_group_id', table_name='user_group')
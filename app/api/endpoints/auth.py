@@ -16,12 +16,16 @@ from app.db.base import get_db
 from app.auth.oauth import oauth, create_access_token, get_current_user
 from app.crud.user import get_or_create_user_by_google_info
 from app.crud.invitation import verify_invitation_code, use_invitation
-from app.crud.group import add_user_to_group, get_group, add_new_user_to_general_groups
+from app.crud.group import add_user_to_group, get_group_summary
 from app.crud import phone_verification as crud_phone
+from app.crud import message_archive as crud_archive
 from app.schemas.user import Token, User
 from app.schemas.invitation import InvitationVerify
 from app.config import settings
 from app.services.whatsapp import whatsapp_service
+from app.services.channel_registry import channel_registry
+from app.services.connection_manager import manager
+from app.services.membership import membership
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -298,7 +302,8 @@ async def verify_invitation(
                 detail="Failed to process invitation"
             )
 
-        # Add user to the specific group
+        # Add user to the specific group; having redeemed an invitation, a real
+        # user is now an implied member of every general group
         try:
             await add_user_to_group(db, invitation.group_id, user.id)
             logger.info(f"User {user.id} added to group {invitation.group_id}")
@@ -309,15 +314,6 @@ async def verify_invitation(
                 detail="Failed to join group"
             )
 
-        # Add real users to general groups (never demo users; excludes Demo Lounge)
-        if not current_is_demo:
-            try:
-                await add_new_user_to_general_groups(db, user.id)
-                logger.info(f"User {user.id} added to general groups")
-            except Exception as e:
-                logger.error(f"Failed to add user to general groups: {e}")
-                # This is not critical, so we'll log but not fail
-        
         # Create a new access token for the fully registered user
         try:
             access_token = create_access_token(
@@ -377,15 +373,14 @@ async def join_group_with_code(
         )
     
     # Check if user is already a member of the group
-    group = await get_group(db, invitation.group_id)
+    group = await get_group_summary(db, invitation.group_id)
     if not group:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Group not found"
         )
     
-    member_ids = [member.id for member in group.members]
-    if current_user.id in member_ids:
+    if await membership.is_member(db, current_user.id, group.id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You are already a member of this group"
@@ -424,8 +419,13 @@ async def delete_account(
         {"uid": uid}
     )
 
-    # 2. Delete messages they authored
+    # 2. Delete messages they authored, live and archived (remembering where, to tell live clients and caches)
+    result = await db.execute(text("SELECT DISTINCT channel_id FROM messages WHERE author_id=:uid"), {"uid": uid})
+    authored_channel_ids = [str(row[0]) for row in result.fetchall()]
     await db.execute(text("DELETE FROM messages WHERE author_id=:uid"), {"uid": uid})
+    for channel_id in await crud_archive.purge_author(db, current_user.id):
+        if channel_id not in authored_channel_ids:
+            authored_channel_ids.append(channel_id)
 
     # 3. Delete invitations they sent
     await db.execute(text("DELETE FROM invitations WHERE inviter_id=:uid"), {"uid": uid})
@@ -433,23 +433,43 @@ async def delete_account(
     # 4. Delete groups they own (cascade: messages → channels → invitations → memberships → group)
     result = await db.execute(text("SELECT id FROM groups WHERE owner_id=:uid"), {"uid": uid})
     owned_group_ids = [str(row[0]) for row in result.fetchall()]
+    owned_channel_ids = []
     for gid in owned_group_ids:
+        result = await db.execute(text("SELECT id FROM channels WHERE group_id=:gid"), {"gid": gid})
+        owned_channel_ids += [row[0] for row in result.fetchall()]
         await db.execute(text("DELETE FROM messages WHERE channel_id IN (SELECT id FROM channels WHERE group_id=:gid)"), {"gid": gid})
+        await db.execute(text("DELETE FROM message_archive_segments WHERE channel_id IN (SELECT id FROM channels WHERE group_id=:gid)"), {"gid": gid})
+        await db.execute(text("DELETE FROM channel_read_markers WHERE channel_id IN (SELECT id FROM channels WHERE group_id=:gid)"), {"gid": gid})
         await db.execute(text("DELETE FROM channels WHERE group_id=:gid"), {"gid": gid})
         await db.execute(text("DELETE FROM invitations WHERE group_id=:gid"), {"gid": gid})
         await db.execute(text("DELETE FROM user_group WHERE group_id=:gid"), {"gid": gid})
+        await db.execute(text("DELETE FROM general_group_exclusions WHERE group_id=:gid"), {"gid": gid})
         await db.execute(text("DELETE FROM groups WHERE id=:gid"), {"gid": gid})
 
     # 5. Remove from all group memberships
     await db.execute(text("DELETE FROM user_group WHERE user_id=:uid"), {"uid": uid})
+    await db.execute(text("DELETE FROM general_group_exclusions WHERE user_id=:uid"), {"uid": uid})
 
-    # 6. Delete phone verifications
+    # 6. Delete phone verifications and read markers
     await db.execute(text("DELETE FROM phone_verifications WHERE user_id=:uid"), {"uid": uid})
+    await db.execute(text("DELETE FROM channel_read_markers WHERE user_id=:uid"), {"uid": uid})
 
     # 7. Delete the user (raw SQL to avoid ORM relationship cascade conflicts)
     await db.execute(text("DELETE FROM users WHERE id=:uid"), {"uid": uid})
     await db.commit()
 
+    await membership.changed(user_id=current_user.id)
+    for gid in owned_group_ids:
+        await membership.changed(group_id=gid)
+    for channel_id in owned_channel_ids:
+        await channel_registry.changed(channel_id)
+    for channel_id in authored_channel_ids:
+        await manager.broadcast({
+            "type": "messages_purged",
+            "author_id": uid,
+            "channel_id": channel_id
+        }, channel_id)
+
     request.session.clear()
     return {"message": "Account deleted"}
 
@@ -9,6 +9,8 @@ from app.crud import channel as crud_channel
 from app.crud import group as crud_group
 from app.schemas.channel import Channel, ChannelCreate, ChannelUpdate
 from app.schemas.user import User
+from app.services.channel_registry import channel_registry
+from app.services.membership import membership
 
 router = APIRouter()
 
@@ -26,8 +28,7 @@ async def read_channel(
         raise HTTPException(status_code=404, detail="Channel not found")
     
     # Check if user is a member of the group that owns the channel
-    group = await crud_group.get_group(db, channel.group_id)
-    if not group or current_user.id not in [member.id for member in group.members]:
+    if not await membership.is_member(db, current_user.id, channel.group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     return channel
@@ -47,11 +48,12 @@ async def update_channel(
         raise HTTPException(status_code=404, detail="Channel not found")
     
     # Check if user is the owner of the group that owns the channel
-    group = await crud_group.get_group(db, channel.group_id)
+    group = await crud_group.get_group_summary(db, channel.group_id)
     if not group or group.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the group owner can update channels")
     
     channel = await crud_channel.update_channel(db, db_channel=channel, channel_in=channel_in)
+    await channel_registry.changed(channel_id)
     return channel
 
 @router.delete("/{channel_id}", response_model=Channel)
@@ -68,7 +70,7 @@ async def delete_channel(
         raise HTTPException(status_code=404, detail="Channel not found")
     
     # Check if user is the owner of the group that owns the channel
-    group = await crud_group.get_group(db, channel.group_id)
+    group = await crud_group.get_group_summary(db, channel.group_id)
     if not group or group.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the group owner can delete channels")
     
@@ -77,4 +79,5 @@ async def delete_channel(
         raise HTTPException(status_code=400, detail="Cannot delete the general channel")
     
     channel = await crud_channel.delete_channel(db, channel_id=channel_id)
+    await channel_registry.changed(channel_id)
     return channel
\ No newline at end of file
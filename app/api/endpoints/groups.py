@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
@@ -11,6 +11,9 @@ from app.crud import channel as crud_channel
 from app.schemas.group import Group, GroupCreate, GroupUpdate
 from app.schemas.channel import Channel, ChannelCreate
 from app.schemas.user import User
+from app.services.channel_registry import channel_registry
+from app.services.membership import membership
+from app.services.presence import presence
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +21,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Largest page of members returned at once
+MEMBERS_MAX_LIMIT = 200
+
 
 def _is_demo_user(user) -> bool:
     return user.email.endswith("@demo.strangers.club")
@@ -89,14 +95,15 @@ async def read_group(
     """
     Get a specific group by ID.
     """
-    group = await crud_group.get_group(db, group_id)
+    group = await crud_group.get_group_summary(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    member_ids = [member.id for member in group.members]
-    if current_user.id not in member_ids:
+    if not await membership.is_member(db, current_user.id, group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
+    counts = await crud_group.get_member_counts(db, [group_id])
+    group.member_count = counts.get(group_id, 0)
     return group
 
 @router.put("/{group_id}", response_model=Group)
@@ -116,7 +123,10 @@ async def update_group(
     if group.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the group owner can update the group")
     
-    group = await crud_group.update_group(db, db_group=group, group_in=group_in)
+    try:
+        group = await crud_group.update_group(db, db_group=group, group_in=group_in)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return group
 
 @router.delete("/{group_id}", response_model=Group)
@@ -136,25 +146,78 @@ async def delete_group(
         raise HTTPException(status_code=403, detail="Only the group owner can delete the group")
     
     group = await crud_group.delete_group(db, group_id=group_id)
+    await membership.changed(group_id=group_id)
+    for channel in group.channels:
+        await channel_registry.changed(channel.id)
     return group
 
 @router.get("/{group_id}/members")
 async def get_group_members(
     group_id: UUID,
+    response: Response,
+    limit: int = 50,
+    order_by: str = "username",
+    prefix: Optional[str] = None,
+    after: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    group = await crud_group.get_group(db, group_id)
+    """
+    One page of a group's members, ordered by `username` or `joined_at`.
+
+    Pass the `X-Next-Cursor` header of a page as `after` for the next one;
+    it is only set on full pages. `prefix` keeps usernames starting with
+    it (case-sensitive), for @-mention autocomplete.
+    """
+    if order_by not in crud_group.MEMBER_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order_by must be one of {', '.join(crud_group.MEMBER_ORDERS)}")
+    try:
+        after_key = crud_group.decode_member_cursor(after, order_by) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = max(1, min(limit, MEMBERS_MAX_LIMIT))
+
+    group = await crud_group.get_group_summary(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    if current_user.id not in [m.id for m in group.members]:
+    if not await membership.is_member(db, current_user.id, group_id):
         raise HTTPException(status_code=403, detail="Access denied")
+
+    members = await crud_group.get_group_members(
+        db, group, limit=limit, order_by=order_by, prefix=prefix, after=after_key
+    )
+    if len(members) == limit:
+        response.headers["X-Next-Cursor"] = crud_group.encode_member_cursor(members[-1], order_by)
     return [
-        {"id": str(m.id), "username": m.username, "joined_at": None}
-        for m in group.members
+        {"id": str(m.id), "username": m.username, "joined_at": m.joined_at}
+        for m in members
     ]
 
 
+@router.get("/{group_id}/presence")
+async def get_group_presence(
+    group_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Who is online in every channel of a group, in one call.
+
+    Channel IDs come from a single query; the counts and users come from
+    the in-memory presence view, so the cost is O(channels).
+    """
+    group = await crud_group.get_group_summary(db, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if not await membership.is_member(db, current_user.id, group_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    channel_ids = await crud_channel.get_channel_group_map(db, [group_id])
+    return {
+        "group_id": str(group_id),
+        **presence.channel_presence([str(channel_id) for channel_id in channel_ids])
+    }
+
+
 @router.post("/{group_id}/leave")
 async def leave_group(
     group_id: UUID,
@@ -164,18 +227,18 @@ async def leave_group(
     """
     Leave a group. Owners cannot leave — they must delete the group instead.
     """
-    group = await crud_group.get_group(db, group_id)
+    group = await crud_group.get_group_summary(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    member_ids = [member.id for member in group.members]
-    if current_user.id not in member_ids:
+    if not await membership.is_member(db, current_user.id, group_id):
         raise HTTPException(status_code=400, detail="You are not a member of this group")
 
     if group.owner_id == current_user.id:
         raise HTTPException(status_code=400, detail="Owners cannot leave their own group. Delete the group instead.")
 
     await crud_group.remove_user_from_group(db, group_id, current_user.id)
+    await membership.changed(group_id=group_id, user_id=current_user.id)
     return {"message": f"You have left {group.name}"}
 
 
@@ -189,12 +252,11 @@ async def create_channel(
     """
     Create a new channel in a group.
     """
-    group = await crud_group.get_group(db, group_id)
+    group = await crud_group.get_group_summary(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    member_ids = [member.id for member in group.members]
-    if current_user.id not in member_ids:
+    if not await membership.is_member(db, current_user.id, group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     channel_data = channel_in.model_dump()
@@ -202,6 +264,7 @@ async def create_channel(
     
     from app.schemas.channel import ChannelCreate as ChannelCreateSchema
     channel = await crud_channel.create_channel(db, ChannelCreateSchema(**channel_data))
+    await channel_registry.changed(channel.id)
     return channel
 
 @router.get("/{group_id}/channels", response_model=List[Channel])
@@ -215,12 +278,11 @@ async def read_channels(
     """
     Get all channels for a group.
     """
-    group = await crud_group.get_group(db, group_id)
+    group = await crud_group.get_group_summary(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    member_ids = [member.id for member in group.members]
-    if current_user.id not in member_ids:
+    if not await membership.is_member(db, current_user.id, group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
     channels = await crud_channel.get_channels_by_group(db, group_id, skip=skip, limit=limit)
@@ -51,7 +51,7 @@ async def create_invitation(
     """
     try:
         # Check if the group exists
-        group = await crud_group.get_group(db, invitation_in.group_id)
+        group = await crud_group.get_group_summary(db, invitation_in.group_id)
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
         
@@ -100,7 +100,7 @@ async def read_group_invitations(
     """
     try:
         # Check if the group exists
-        group = await crud_group.get_group(db, group_id)
+        group = await crud_group.get_group_summary(db, group_id)
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
         
@@ -168,7 +168,7 @@ async def submit_invitation_code(
     current_user: User = Depends(get_current_active_user)
 ):
     """Use an invitation code — verifies, marks used, adds user to group, returns JWT."""
-    from app.crud.group import add_user_to_group, add_new_user_to_general_groups
+    from app.crud.group import add_user_to_group
     from app.auth.oauth import create_access_token
     from app.config import settings
     from datetime import timedelta
@@ -188,9 +188,8 @@ async def submit_invitation_code(
         raise HTTPException(status_code=403, detail="This invite code is for demo accounts only.")
 
     invitation = await crud_invitation.use_invitation(db, invitation.id, current_user.id)
+    # The redeemed invitation makes a real user an implied member of every general group
     await add_user_to_group(db, invitation.group_id, current_user.id)
-    if not current_user.email.endswith("@demo.strangers.club"):
-        await add_new_user_to_general_groups(db, current_user.id)
 
     token = create_access_token(
         data={"sub": current_user.email},
@@ -248,7 +247,7 @@ async def delete_invitation(
             raise HTTPException(status_code=404, detail="Invitation not found")
 
         # Check if user is the inviter or the group owner
-        group = await crud_group.get_group(db, invitation.group_id)
+        group = await crud_group.get_group_summary(db, invitation.group_id)
         is_inviter = invitation.inviter_id == current_user.id
         is_group_owner = group and group.owner_id == current_user.id
 
@@ -287,7 +286,7 @@ async def generate_new_invitation_code(
     """
     try:
         # Check if the group exists
-        group = await crud_group.get_group(db, group_id)
+        group = await crud_group.get_group_summary(db, group_id)
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
         
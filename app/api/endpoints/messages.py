@@ -1,101 +1,323 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from uuid import UUID
+from datetime import datetime
+import csv
+import io
 import json
 import logging
+import math
 
-from app.db.base import get_db
-from app.auth.oauth import get_current_active_user, get_current_user
+from app.db.base import get_db, async_session_factory
+from app.auth.oauth import get_current_active_user, get_current_active_superuser, get_current_user
 from app.crud import message as crud_message
-from app.crud import channel as crud_channel
-from app.crud import group as crud_group
-from app.schemas.message import Message, MessageCreate, MessageUpdate
+from app.crud import message_archive as crud_archive
+from app.crud import read_marker as crud_read_marker
+from app.schemas.message import (
+    Message, MessageCreate, MessageInDB, MessageSearchResult, MessageUpdate, ReadMarkerUpdate, UnreadCounts
+)
 from app.schemas.user import User
+from app.services.channel_registry import channel_registry
+from app.services.connection_manager import manager
+from app.services.message_archiver import message_archiver
+from app.services.membership import membership
+from app.services.message_cache import recent_messages
+from app.services.presence import presence
+from app.services.rate_limiter import message_limits
+from app.services.read_markers import read_markers
+from app.services.typing_indicators import typing_indicators
+from app.services.message_writer import message_writer
+from app.services.wire_protocol import Frame, FrameDecodeError
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Class to manage WebSocket connections for chat
-class ConnectionManager:
-    def __init__(self):
-        # channel_id -> list of (WebSocket, user_id) tuples
-        self.active_connections: Dict[str, List[tuple]] = {}
-
-    async def connect(self, websocket: WebSocket, channel_id: str, user_id: str):
-        await websocket.accept()
-        if channel_id not in self.active_connections:
-            self.active_connections[channel_id] = []
-        self.active_connections[channel_id].append((websocket, user_id))
-        logger.info(f"WebSocket connected for channel {channel_id}, user {user_id}")
-
-    def disconnect(self, websocket: WebSocket, channel_id: str, user_id: str):
-        if channel_id in self.active_connections:
-            # Remove the specific connection
-            self.active_connections[channel_id] = [
-                (ws, uid) for ws, uid in self.active_connections[channel_id] 
-                if ws != websocket
-            ]
-            # Clean up empty channel lists
-            if not self.active_connections[channel_id]:
-                del self.active_connections[channel_id]
-        logger.info(f"WebSocket disconnected for channel {channel_id}, user {user_id}")
-
-    async def broadcast(self, message: dict, channel_id: str, exclude_user_id: str = None):
-        """Broadcast message to all connections in a channel, optionally excluding a user"""
-        if channel_id in self.active_connections:
-            disconnected = []
-            for websocket, user_id in self.active_connections[channel_id]:
-                # Skip the user who sent the message to avoid duplication
-                if exclude_user_id and user_id == exclude_user_id:
-                    continue
-                    
-                try:
-                    await websocket.send_text(json.dumps(message))
-                except Exception as e:
-                    logger.error(f"Error sending message to websocket: {e}")
-                    disconnected.append((websocket, user_id))
-            
-            # Remove disconnected connections
-            for ws, uid in disconnected:
-                self.disconnect(ws, channel_id, uid)
-
-    def get_connected_users(self, channel_id: str) -> List[str]:
-        """Get list of connected user IDs for a channel"""
-        if channel_id in self.active_connections:
-            return [user_id for _, user_id in self.active_connections[channel_id]]
-        return []
-
-manager = ConnectionManager()
+# Most messages sent from the database to a resuming client before it is
+# told to reload the channel instead
+REPLAY_DB_LIMIT = 200
+# Largest page of search results
+SEARCH_MAX_LIMIT = 100
+# Channel export formats and their media types
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_FIELDS = ["id", "created_at", "updated_at", "author_id", "author", "content"]
 
 @router.get("/channel/{channel_id}", response_model=List[Message])
 async def read_messages(
     channel_id: UUID,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Get messages for a specific channel.
+    Get messages for a specific channel, oldest first.
+
+    Pass the `X-Before-Cursor` header of a page as `before` to scroll back,
+    or its `X-After-Cursor` as `after` to fetch newer messages. `skip` is
+    only honoured when no cursor is given, and only pages through messages
+    not yet archived. Cursor pages continue into the archive once the live
+    table runs out. The first page of a recently opened channel is served
+    from the recent-message cache.
     """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    try:
+        before_key = crud_message.decode_cursor(before) if before else None
+        after_key = crud_message.decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
     # Check if user is a member of the group that owns the channel
-    channel = await crud_channel.get_channel(db, channel_id)
+    channel = await channel_registry.get(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     
-    group = await crud_group.get_group(db, channel.group_id)
-    if not group or current_user.id not in [member.id for member in group.members]:
+    if not await membership.is_member(db, current_user.id, channel.group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    messages = await crud_message.get_messages_by_channel(db, channel_id, skip=skip, limit=limit)
+    first_page = before_key is None and after_key is None and skip == 0
+    if first_page:
+        cached = recent_messages.get(str(channel_id), limit)
+        if cached is not None:
+            _set_history_headers(response, cached, limit)
+            return [entry.record for entry in reversed(cached)]
+    
+    if first_page and limit <= recent_messages.size:
+        # Read a full cache's worth so the next opener is served from memory
+        version = recent_messages.version(str(channel_id))
+        messages = await crud_message.get_messages_by_channel(
+            db, channel_id, limit=recent_messages.size
+        )
+        messages += await _older_archived(db, channel_id, messages, None, recent_messages.size)
+        recent_messages.fill(
+            str(channel_id),
+            [Message.model_validate(message).model_dump(mode="json") for message in messages],
+            version
+        )
+        messages = messages[:limit]
+    elif after_key is not None:
+        # Archived messages are older than live ones, so they come first
+        archived = await crud_archive.get_archived_messages(db, channel_id, limit=limit, after=after_key)
+        messages = await crud_message.get_messages_by_channel(
+            db, channel_id, limit=limit - len(archived),
+            after=(archived[0].created_at, archived[0].id) if archived else after_key
+        ) if len(archived) < limit else []
+        messages += archived
+    else:
+        messages = await crud_message.get_messages_by_channel(
+            db, channel_id, skip=skip, limit=limit, before=before_key
+        )
+        if skip == 0:
+            messages += await _older_archived(db, channel_id, messages, before_key, limit)
+    _set_history_headers(response, messages, limit)
     # Reverse the order to get oldest first
     messages.reverse()
     return messages
 
+async def _older_archived(db: AsyncSession, channel_id: UUID, messages, before, limit: int):
+    """
+    Archived messages to complete a newest-first page of live messages
+    that came up short of `limit`: the live table has no older ones.
+    """
+    if len(messages) >= limit:
+        return []
+    if messages:
+        before = (messages[-1].created_at, messages[-1].id)
+    return await crud_archive.get_archived_messages(
+        db, channel_id, limit=limit - len(messages), before=before
+    )
+
+@router.get("/search", response_model=List[MessageSearchResult])
+async def search_messages(
+    q: str,
+    response: Response,
+    channel_id: Optional[UUID] = None,
+    group_id: Optional[UUID] = None,
+    limit: int = 20,
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Full-text search over messages in the caller's groups, newest first.
+
+    Narrow it with `channel_id` or `group_id`; channels outside the
+    caller's groups never match. Pass the `X-Before-Cursor` header of a
+    page as `before` for the next one. Each result carries a `snippet`
+    of HTML-escaped text with the matches wrapped in <mark> tags.
+    """
+    terms = crud_message.search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+    try:
+        before_key = crud_message.decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    
+    hits = await crud_message.search_messages(
+        db, current_user.id, terms,
+        channel_id=channel_id, group_id=group_id, limit=limit, before=before_key
+    )
+    if len(hits) == limit:
+        response.headers["X-Before-Cursor"] = crud_message.encode_cursor(hits[-1][0])
+    return [
+        {
+            **Message.model_validate(message).model_dump(),
+            "snippet": crud_message.render_snippet(snippet)
+        }
+        for message, snippet in hits
+    ]
+
+@router.put("/channel/{channel_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+async def mark_channel_read(
+    channel_id: UUID,
+    marker_in: ReadMarkerUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Mark a channel read up to a message. Markers only move forward and are
+    written in batches, see `ReadMarkerBuffer`. WebSocket clients can send
+    a `read` frame instead.
+    """
+    channel = await channel_registry.get(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    
+    if not await membership.is_member(db, current_user.id, channel.group_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    read_markers.mark(current_user.id, channel_id, marker_in.message_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/unread", response_model=UnreadCounts)
+async def read_unread_counts(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Unread message counts for every channel the user can see.
+    """
+    if read_markers.has_pending(current_user.id):
+        # Make the user's own recent reads visible to the query
+        await read_markers.flush()
+    channels = await crud_read_marker.get_unread_counts(db, current_user.id)
+    return {
+        "total": sum(channel["unread_count"] for channel in channels),
+        "channels": channels
+    }
+
+@router.get("/channel/{channel_id}/export")
+async def export_channel_messages(
+    channel_id: UUID,
+    format: str = "ndjson",
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Download a channel's whole history, oldest first, as NDJSON (one
+    message object per line) or CSV.
+
+    The response is streamed from a server-side cursor, so memory use does
+    not grow with the size of the channel.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    channel = await channel_registry.get(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    
+    if not await membership.is_member(db, current_user.id, channel.group_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return StreamingResponse(
+        _export_chunks(channel_id, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="channel-{channel_id}.{format}"'}
+    )
+
+async def _export_chunks(channel_id: UUID, format: str):
+    """
+    Encode the export one batch of rows at a time. Uses its own session so
+    the long-running cursor is not tied to the request session's
+    transaction and is closed as soon as the stream ends.
+    """
+    if format == "csv":
+        yield _csv_lines([EXPORT_FIELDS])
+    async with async_session_factory() as db:
+        async for batch in _channel_history(db, channel_id):
+            rows = [
+                [
+                    str(message_id),
+                    created_at.isoformat() if created_at else None,
+                    updated_at.isoformat() if updated_at else None,
+                    str(author_id),
+                    author,
+                    content
+                ]
+                for message_id, created_at, updated_at, author_id, author, content in batch
+            ]
+            if format == "csv":
+                yield _csv_lines(rows)
+            else:
+                yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+
+async def _channel_history(db: AsyncSession, channel_id: UUID):
+    """A channel's archived then live messages, oldest first, in batches."""
+    async for batch in crud_archive.stream_archived_messages(db, channel_id):
+        yield batch
+    async for batch in crud_message.stream_channel_messages(db, channel_id):
+        yield batch
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _set_history_headers(response: Response, messages, limit: int):
+    """
+    Set the paging cursors for a newest-first page of messages.
+    """
+    if messages:
+        # Last item is the oldest on the page
+        if len(messages) == limit:
+            response.headers["X-Before-Cursor"] = crud_message.encode_cursor(messages[-1])
+        response.headers["X-After-Cursor"] = crud_message.encode_cursor(messages[0])
+
+def _message_record(message, author) -> Dict[str, Any]:
+    """
+    Serialize a newly stored message the way `read_messages` returns it, for
+    the recent-message cache (sent as the broadcast's record).
+    """
+    record = MessageInDB.model_validate(message).model_dump(mode="json")
+    record["author"] = User.model_validate(author).model_dump(mode="json")
+    return record
+
+def _new_message_event(message, username: str) -> Dict[str, Any]:
+    """
+    Build the `new_message` event clients render for a stored message.
+    """
+    return {
+        "type": "new_message",
+        "id": str(message.id),
+        "content": message.content,
+        "author": {
+            "id": str(message.author_id),
+            "username": username
+        },
+        "channel_id": str(message.channel_id),
+        "created_at": message.created_at.isoformat()
+    }
+
 @router.post("/channel/{channel_id}", response_model=Message)
 async def create_message(
     channel_id: UUID,
@@ -107,14 +329,21 @@ async def create_message(
     Create a new message in a channel via HTTP (fallback for when WebSocket is not available).
     """
     # Check if user is a member of the group that owns the channel
-    channel = await crud_channel.get_channel(db, channel_id)
+    channel = await channel_registry.get(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     
-    group = await crud_group.get_group(db, channel.group_id)
-    if not group or current_user.id not in [member.id for member in group.members]:
+    if not await membership.is_member(db, current_user.id, channel.group_id):
         raise HTTPException(status_code=403, detail="Access denied")
     
+    retry_after = await message_limits.check(str(current_user.id), str(channel_id))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many messages, slow down",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    
     # Override channel_id from path parameter
     message_data = message_in.model_dump()
     message_data["channel_id"] = channel_id
@@ -124,18 +353,10 @@ async def create_message(
     )
     
     # Broadcast the message to all connected WebSocket clients
-    message_dict = {
-        "type": "new_message",
-        "id": str(message.id),
-        "content": message.content,
-        "author": {
-            "id": str(message.author_id),
-            "username": current_user.username
-        },
-        "channel_id": str(message.channel_id),
-        "created_at": message.created_at.isoformat()
-    }
-    await manager.broadcast(message_dict, str(channel_id))
+    message_dict = _new_message_event(message, current_user.username)
+    await manager.broadcast(
+        message_dict, str(channel_id), record=_message_record(message, current_user)
+    )
     
     return message
 
@@ -149,15 +370,15 @@ async def update_message(
     """
     Update a message.
     """
-    message = await crud_message.get_message(db, message_id)
-    if not message:
+    access = await crud_message.get_message_access(db, message_id, current_user.id)
+    if not access:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    # Check if user is the author of the message
-    if message.author_id != current_user.id:
+    # Check if user is the author of the message (and still in the group)
+    if not access.can_edit(current_user.id):
         raise HTTPException(status_code=403, detail="Only the author can update the message")
     
-    message = await crud_message.update_message(db, db_message=message, message_in=message_in)
+    message = await crud_message.update_message(db, db_message=access.message, message_in=message_in)
     
     # Broadcast the update to all connected WebSocket clients
     update_dict = {
@@ -177,24 +398,30 @@ async def delete_message(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Delete a message.
+    Delete a message, live or archived.
     """
-    message = await crud_message.get_message(db, message_id)
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
+    access = await crud_message.get_message_access(db, message_id, current_user.id)
+    segment_id = None
+    if not access:
+        archived = await crud_archive.get_archived_message_access(db, message_id, current_user.id)
+        if not archived:
+            raise HTTPException(status_code=404, detail="Message not found")
+        access, segment_id = archived
     
     # Check if user is the author of the message or the group owner
-    channel = await crud_channel.get_channel(db, message.channel_id)
-    group = await crud_group.get_group(db, channel.group_id)
-    
-    if message.author_id != current_user.id and group.owner_id != current_user.id:
+    if not access.can_delete(current_user.id):
         raise HTTPException(
             status_code=403, 
             detail="Only the author or group owner can delete the message"
         )
     
-    channel_id = message.channel_id
-    message = await crud_message.delete_message(db, message_id=message_id)
+    channel_id = access.message.channel_id
+    if segment_id is None:
+        message = await crud_message.delete_message(db, db_message=access.message)
+    elif await crud_archive.delete_archived_message(db, segment_id, message_id):
+        message = access.message
+    else:
+        raise HTTPException(status_code=404, detail="Message not found")
     
     # Broadcast the deletion to all connected WebSocket clients
     delete_dict = {
@@ -205,114 +432,177 @@ async def delete_message(
     
     return message
 
+async def _handle_channel_frame(connection, user, channel_id: str, message_data: Dict[str, Any]):
+    """
+    Handle a chat frame addressed to a channel the socket is subscribed to.
+    """
+    logger.info(f"Received WebSocket message: {message_data}")
+    
+    if message_data.get("type") == "new_message":
+        if not await _can_access_channel(user, channel_id):
+            await _leave_channel(connection, user, channel_id)
+            connection.send({
+                "type": "error",
+                "message": "Access denied",
+                "channel_id": channel_id,
+                "tempId": message_data.get("tempId")
+            })
+            return
+        
+        retry_after = await message_limits.check(str(user.id), channel_id)
+        if retry_after:
+            connection.send({
+                "type": "rate_limited",
+                "channel_id": channel_id,
+                "tempId": message_data.get("tempId"),
+                "retry_after": round(retry_after, 2)
+            })
+            return
+        
+        # Persist through the group-commit writer; this returns once the
+        # batch holding the message has committed
+        message_in = MessageCreate(
+            content=message_data.get("content", ""),
+            channel_id=UUID(channel_id)
+        )
+        
+        message = await message_writer.submit(
+            message_in.content, author_id=user.id, channel_id=message_in.channel_id
+        )
+        
+        # Broadcast the message to all connected clients
+        message_dict = _new_message_event(message, user.username)
+        
+        # Send to the sender first (immediate feedback)
+        connection.send({
+            **message_dict,
+            "type": "message_sent",  # Special type for sender confirmation
+            "tempId": message_data.get("tempId")
+        })
+        
+        # Then broadcast to others
+        await manager.broadcast(
+            message_dict, channel_id, exclude_user_id=str(user.id),
+            record=_message_record(message, user)
+        )
+        
+    elif message_data.get("type") == "read":
+        try:
+            message_id = UUID(str(message_data.get("message_id")))
+        except ValueError:
+            connection.send({"type": "error", "message": "Invalid message_id", "channel_id": channel_id})
+            return
+        read_markers.mark(user.id, UUID(channel_id), message_id)
+        
+    elif message_data.get("type") == "typing":
+        # Coalesced into the channel's next typing_users event
+        typing_indicators.update(
+            channel_id, str(user.id), user.username, bool(message_data.get("is_typing", False))
+        )
+
+async def _announce_join(user, channel_id: str):
+    """
+    Tell a channel the user joined, unless they were already online in it.
+    """
+    await presence.joined(channel_id, str(user.id), user.username)
+
+async def _leave_channel(connection, user, channel_id: str):
+    """
+    Unsubscribe a socket from a channel; the channel is told the user left
+    once their last socket in it is gone (after the presence grace period).
+    """
+    if manager.unsubscribe(connection, channel_id):
+        presence.left(channel_id, str(user.id))
+        typing_indicators.clear(channel_id, str(user.id))
+
+async def _receive_frame(websocket: WebSocket) -> Frame:
+    """
+    Wait for the next client frame, text or binary depending on the
+    encoding negotiated for the socket.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message.get("text") or ""
+
+def _connected_users(channel_id: str) -> List[str]:
+    """
+    Users online in a channel on any worker, including sockets on this
+    worker whose join has not come back through the broker yet.
+    """
+    return list(set(presence.online_user_ids(channel_id)) | set(manager.get_connected_users(channel_id)))
+
 @router.websocket("/ws/{channel_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
     channel_id: str,
-    token: str,
-    db: AsyncSession = Depends(get_db)
+    token: str
 ):
     """
-    WebSocket endpoint for real-time messaging.
+    WebSocket endpoint for real-time messaging in a single channel.
+
+    The socket does not hold a pooled database connection while it is open:
+    a short-lived session is used for the auth/membership check and another
+    one for each persisted frame. New clients should prefer the multiplexed
+    `/ws` gateway.
     """
     user = None
+    connection = None
     try:
-        # Authenticate the user
-        user = await get_current_user(token=token, db=db)
-        
-        # Check if user is a member of the group that owns the channel
-        channel = await crud_channel.get_channel(db, UUID(channel_id))
-        if not channel:
-            await websocket.close(code=1008, reason="Channel not found")
-            return
-        
-        group = await crud_group.get_group(db, channel.group_id)
-        if not group or user.id not in [member.id for member in group.members]:
-            await websocket.close(code=1008, reason="Access denied")
-            return
+        async with async_session_factory() as db:
+            # Authenticate the user
+            user = await get_current_user(token=token, db=db)
+            
+            # Check if user is a member of the group that owns the channel
+            channel = await channel_registry.get(db, UUID(channel_id))
+            if not channel:
+                await websocket.close(code=1008, reason="Channel not found")
+                return
+            
+            if not await membership.is_member(db, user.id, channel.group_id):
+                await websocket.close(code=1008, reason="Access denied")
+                return
         
         # Accept the connection
-        await manager.connect(websocket, channel_id, str(user.id))
+        connection = await manager.connect(websocket, str(user.id))
+        manager.subscribe(connection, channel_id)
         
         # Send connection established message
-        await websocket.send_text(json.dumps({
+        connection.send({
             "type": "connection_established",
             "user": user.username,
             "channel_id": channel_id,
-            "connected_users": manager.get_connected_users(channel_id)
-        }))
+            "connected_users": _connected_users(channel_id)
+        })
         
         # Notify other users that someone joined
-        await manager.broadcast({
-            "type": "user_connected",
-            "user": user.username,
-            "channel_id": channel_id
-        }, channel_id, exclude_user_id=str(user.id))
+        await _announce_join(user, channel_id)
         
         try:
             while True:
                 # Wait for messages from the client
-                data = await websocket.receive_text()
+                data = await _receive_frame(websocket)
+                connection.touch()
                 
                 # Process the message
                 try:
-                    message_data = json.loads(data)
-                    logger.info(f"Received WebSocket message: {message_data}")
-                    
-                    if message_data.get("type") == "new_message":
-                        # Create a new message in the database
-                        message_in = MessageCreate(
-                            content=message_data.get("content", ""),
-                            channel_id=UUID(channel_id)
-                        )
-                        
-                        message = await crud_message.create_message(
-                            db, message_in, author_id=user.id
-                        )
-                        
-                        # Broadcast the message to all connected clients
-                        message_dict = {
-                            "type": "new_message",
-                            "id": str(message.id),
-                            "content": message.content,
-                            "author": {
-                                "id": str(message.author_id),
-                                "username": user.username
-                            },
-                            "channel_id": str(message.channel_id),
-                            "created_at": message.created_at.isoformat()
-                        }
-                        
-                        # Send to the sender first (immediate feedback)
-                        await websocket.send_text(json.dumps({
-                            **message_dict,
-                            "type": "message_sent"  # Special type for sender confirmation
-                        }))
-                        
-                        # Then broadcast to others
-                        await manager.broadcast(message_dict, channel_id, exclude_user_id=str(user.id))
-                        
-                    elif message_data.get("type") == "typing":
-                        # Handle typing indicators
-                        typing_dict = {
-                            "type": "typing",
-                            "user": user.username,
-                            "channel_id": channel_id,
-                            "is_typing": message_data.get("is_typing", False)
-                        }
-                        await manager.broadcast(typing_dict, channel_id, exclude_user_id=str(user.id))
-                        
-                except json.JSONDecodeError:
-                    await websocket.send_text(json.dumps({
+                    message_data = connection.codec.decode(data)
+                    if message_data.get("type") == "pong":
+                        continue
+                    await _handle_channel_frame(connection, user, channel_id, message_data)
+                except FrameDecodeError:
+                    connection.send({
                         "type": "error",
-                        "message": "Invalid JSON format"
-                    }))
+                        "message": f"Invalid {connection.codec.label} format"
+                    })
                 except Exception as e:
                     logger.error(f"Error processing WebSocket message: {e}")
-                    await websocket.send_text(json.dumps({
+                    connection.send({
                         "type": "error",
                         "message": str(e)
-                    }))
+                    })
                     
         except WebSocketDisconnect:
             logger.info(f"WebSocket disconnected for user {user.username}")
@@ -325,27 +615,236 @@ async def websocket_endpoint(
             logger.error(f"Error closing websocket: {close_error}")
     finally:
         # Clean up connection
-        if user:
-            manager.disconnect(websocket, channel_id, str(user.id))
+        if connection:
+            # Presence and typing state follow via the disconnect listeners
+            manager.disconnect(connection)
+
+async def _can_access_channel(user, channel_id: str) -> bool:
+    """
+    Check a gateway subscription or post against the channel registry and
+    the membership cache, so leaving or losing a group takes effect on
+    open sockets without a reconnect. Both are in memory once warm.
+    """
+    async with async_session_factory() as db:
+        channel = await channel_registry.get(db, UUID(channel_id))
+        if not channel:
+            return False
+        return await membership.is_member(db, user.id, channel.group_id)
+
+async def _replay_from_db(connection, channel_id: str, message_data: Dict[str, Any]):
+    """
+    Send the messages stored after the client's last one when the gap is
+    no longer covered by the in-memory replay buffer.
+    """
+    try:
+        after = (
+            datetime.fromisoformat(message_data["last_created_at"]),
+            UUID(str(message_data["last_message_id"]))
+        )
+    except (KeyError, TypeError, ValueError):
+        after = None
+    
+    events = []
+    if after is not None:
+        async with async_session_factory() as db:
+            messages = await crud_message.get_messages_by_channel(
+                db, UUID(channel_id), limit=REPLAY_DB_LIMIT, after=after
+            )
+        # Oldest first, like the in-memory delta
+        messages.reverse()
+        events = [_new_message_event(message, message.author.username) for message in messages]
+    
+    connection.send({
+        "type": "replay",
+        "channel_id": channel_id,
+        "source": "database",
+        "events": events,
+        # Without an anchor, or with more than a page missing, the client
+        # has to reload the channel history itself
+        "complete": after is not None and len(events) < REPLAY_DB_LIMIT
+    })
+
+async def _subscribe_with_replay(connection, user, channel_id: str, message_data: Dict[str, Any]):
+    """
+    Subscribe a gateway socket and, when the client is resuming, send what
+    it missed since the last sequence number it saw.
+
+    A resume frame carries `last_seq` and `epoch` from the previous socket,
+    plus `last_message_id`/`last_created_at` for the database fallback. The
+    delta is taken from the replay buffer in the same step as subscribing
+    (no await in between), so live events queue strictly after it.
+    """
+    replay = manager.replay
+    last_seq = message_data.get("last_seq")
+    resuming = isinstance(last_seq, int) and last_seq >= 0
+    joined = manager.subscribe(connection, channel_id)
+    events = None
+    if joined and resuming and message_data.get("epoch") == replay.epoch:
+        events = replay.since(channel_id, last_seq)
+    
+    connection.send({
+        "type": "subscribed",
+        "channel_id": channel_id,
+        "epoch": replay.epoch,
+        "seq": replay.current_seq(channel_id),
+        "connected_users": _connected_users(channel_id)
+    })
+    if not joined:
+        return
+    if events is not None:
+        connection.send({
+            "type": "replay",
+            "channel_id": channel_id,
+            "source": "memory",
+            "events": events,
+            "complete": True
+        })
+    
+    await _announce_join(user, channel_id)
+    if resuming and events is None:
+        await _replay_from_db(connection, channel_id, message_data)
+
+@router.websocket("/ws")
+async def websocket_gateway(
+    websocket: WebSocket,
+    token: str
+):
+    """
+    Multiplexed WebSocket: one socket per user for every channel they open.
+
+    Clients send {"type": "subscribe", "channel_id": ...} (or "channel_ids"
+    for several at once) and the matching "unsubscribe"; chat frames carry
+    the channel_id they are meant for. A subscribe frame may resume from a
+    previous socket, see `_subscribe_with_replay`. Access is checked on
+    every subscribe and post against the in-memory channel registry and
+    membership cache, so switching channel needs no new handshake.
+    """
+    user = None
+    connection = None
+    try:
+        async with async_session_factory() as db:
+            # Authenticate the user
+            user = await get_current_user(token=token, db=db)
+        
+        connection = await manager.connect(websocket, str(user.id))
+        connection.send({
+            "type": "connection_established",
+            "user": user.username,
+            "channel_id": None
+        })
+        
+        try:
+            while True:
+                data = await _receive_frame(websocket)
+                connection.touch()
+                
+                try:
+                    message_data = connection.codec.decode(data)
+                    frame_type = message_data.get("type")
+                    
+                    if frame_type == "pong":
+                        # Heartbeat reply; touch() above already recorded it
+                        continue
+                    
+                    if frame_type in ("subscribe", "unsubscribe"):
+                        channel_ids = message_data.get("channel_ids") or [message_data.get("channel_id")]
+                        for channel_id in channel_ids:
+                            channel_id = str(channel_id)
+                            if frame_type == "unsubscribe":
+                                await _leave_channel(connection, user, channel_id)
+                                connection.send({"type": "unsubscribed", "channel_id": channel_id})
+                            elif await _can_access_channel(user, channel_id):
+                                await _subscribe_with_replay(connection, user, channel_id, message_data)
+                            else:
+                                connection.send({
+                                    "type": "error",
+                                    "message": "Access denied",
+                                    "channel_id": channel_id
+                                })
+                        continue
+                    
+                    channel_id = str(message_data.get("channel_id"))
+                    if channel_id not in connection.channels:
+                        connection.send({
+                            "type": "error",
+                            "message": "Not subscribed to this channel",
+                            "channel_id": channel_id
+                        })
+                        continue
+                    await _handle_channel_frame(connection, user, channel_id, message_data)
+                    
+                except FrameDecodeError:
+                    connection.send({
+                        "type": "error",
+                        "message": f"Invalid {connection.codec.label} format"
+                    })
+                except Exception as e:
+                    logger.error(f"Error processing WebSocket message: {e}")
+                    connection.send({
+                        "type": "error",
+                        "message": str(e)
+                    })
+                    
+        except WebSocketDisconnect:
+            logger.info(f"WebSocket gateway disconnected for user {user.username}")
             
-            # Notify other users that someone left
-            await manager.broadcast({
-                "type": "user_disconnected",
-                "user": user.username,
-                "channel_id": channel_id
-            }, channel_id)
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+        try:
+            await websocket.close(code=1008, reason=str(e))
+        except Exception as close_error:
+            logger.error(f"Error closing websocket: {close_error}")
+    finally:
+        if connection:
+            # Presence and typing state follow via the disconnect listeners
+            manager.disconnect(connection)
 
 @router.get("/ws/status/{channel_id}")
 async def get_websocket_status(
-    channel_id: str,
+    channel_id: UUID,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Get WebSocket connection status for a channel.
+    Get WebSocket connection status for a channel (members only).
     """
-    connected_users = manager.get_connected_users(channel_id)
+    channel = await channel_registry.get(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    
+    if not await membership.is_member(db, current_user.id, channel.group_id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    connected_users = _connected_users(str(channel_id))
     return {
-        "channel_id": channel_id,
+        "channel_id": str(channel_id),
         "connected_users_count": len(connected_users),
         "connected_users": connected_users
+    }
+
+@router.get("/stats")
+async def get_realtime_stats(
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Ingestion and fan-out statistics for this worker (superusers only).
+    """
+    return {
+        "worker_id": manager.broker.worker_id,
+        "writer": message_writer.stats(),
+        "recent_messages": recent_messages.stats(),
+        "typing": typing_indicators.stats(),
+        "rate_limited": message_limits.limited,
+        "rate_limit_buckets_pruned": message_limits.pruned,
+        "read_markers": read_markers.stats(),
+        "archive": message_archiver.stats(),
+        "membership": membership.stats(),
+        "channels": channel_registry.stats(),
+        "connections": {
+            "open": manager.connection_count(),
+            "users": len(manager.user_connections),
+            "channels": len(manager.active_connections),
+            "slow_consumers_dropped": manager.slow_consumers_dropped,
+            "heartbeat": manager.heartbeat_stats()
+        }
     }
\ No newline at end of file
@@ -59,6 +59,64 @@ class Settings(BaseSettings):
     # Database - FORCED asyncpg
     DATABASE_URL: str = get_database_url()
     
+    # Realtime pub/sub between workers: "memory" (single worker), "sqlite"
+    # (several workers on one host, for development/tests) or "postgres"
+    BROKER_BACKEND: str = os.getenv("BROKER_BACKEND", "memory")
+    BROKER_SQLITE_PATH: str = os.getenv("BROKER_SQLITE_PATH", "./broker.db")
+
+    # Outbound frames buffered per WebSocket before the client is dropped as too slow
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+
+    # Quiet sockets are pinged every interval and dropped after the timeout without a frame (0 disables)
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "25"))
+    WS_HEARTBEAT_TIMEOUT_SECONDS: float = float(os.getenv("WS_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+
+    # Negotiate permessage-deflate with clients that offer it (uvicorn's --ws-per-message-deflate)
+    WS_PER_MESSAGE_DEFLATE: bool = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+
+    # Recent events kept per channel for reconnect replay, and how many channels keep a buffer
+    REPLAY_BUFFER_SIZE: int = int(os.getenv("REPLAY_BUFFER_SIZE", "256"))
+    REPLAY_MAX_CHANNELS: int = int(os.getenv("REPLAY_MAX_CHANNELS", "5000"))
+
+    # Newest messages cached per channel for the first history page, and how many channels are cached
+    RECENT_MESSAGES_CACHE_SIZE: int = int(os.getenv("RECENT_MESSAGES_CACHE_SIZE", "100"))
+    RECENT_MESSAGES_CACHE_CHANNELS: int = int(os.getenv("RECENT_MESSAGES_CACHE_CHANNELS", "1000"))
+
+    # Seconds a user stays online in a channel after their last socket leaves it
+    PRESENCE_OFFLINE_GRACE_SECONDS: float = float(os.getenv("PRESENCE_OFFLINE_GRACE_SECONDS", "5"))
+    # Every worker heartbeats this often; users of a worker that misses this many heartbeats are dropped
+    PRESENCE_HEARTBEAT_SECONDS: float = float(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "10"))
+    PRESENCE_HEARTBEAT_MISSES: int = int(os.getenv("PRESENCE_HEARTBEAT_MISSES", "3"))
+
+    # Typing indicators are coalesced into one event per channel per tick; typers expire after the TTL
+    TYPING_TICK_MS: int = int(os.getenv("TYPING_TICK_MS", "500"))
+    TYPING_TTL_SECONDS: float = float(os.getenv("TYPING_TTL_SECONDS", "5"))
+
+    # Message rate limits: "memory" (per worker) or "database" (shared by all workers)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_USER_PER_SECOND: float = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "1"))
+    RATE_LIMIT_USER_BURST: float = float(os.getenv("RATE_LIMIT_USER_BURST", "10"))
+    RATE_LIMIT_CHANNEL_PER_SECOND: float = float(os.getenv("RATE_LIMIT_CHANNEL_PER_SECOND", "20"))
+    RATE_LIMIT_CHANNEL_BURST: float = float(os.getenv("RATE_LIMIT_CHANNEL_BURST", "60"))
+    # Fully refilled buckets are deleted this often (0 disables)
+    RATE_LIMIT_PRUNE_INTERVAL_SECONDS: float = float(os.getenv("RATE_LIMIT_PRUNE_INTERVAL_SECONDS", "300"))
+
+    # Group commit for chat ingestion: messages arriving within the delay share one INSERT
+    MESSAGE_WRITER_MAX_BATCH: int = int(os.getenv("MESSAGE_WRITER_MAX_BATCH", "256"))
+    MESSAGE_WRITER_MAX_DELAY_MS: float = float(os.getenv("MESSAGE_WRITER_MAX_DELAY_MS", "5"))
+
+    # Read markers are buffered in memory and written in one batch this often
+    READ_MARKER_FLUSH_SECONDS: float = float(os.getenv("READ_MARKER_FLUSH_SECONDS", "2"))
+
+    # Positive membership checks are cached per worker for this long
+    MEMBERSHIP_CACHE_TTL_SECONDS: float = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "30"))
+    MEMBERSHIP_CACHE_SIZE: int = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "100000"))
+
+    # Messages older than this many days move to compressed archive segments (0 disables)
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_SEGMENT_SIZE: int = int(os.getenv("ARCHIVE_SEGMENT_SIZE", "500"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
     # Admin
     ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL", "")
 
@@ -84,6 +142,19 @@ class Settings(BaseSettings):
             origins = []
         return origins
     
+    @validator("RATE_LIMIT_USER_PER_SECOND", "RATE_LIMIT_CHANNEL_PER_SECOND")
+    def check_rate_limit_rate(cls, v):
+        # Buckets divide by their refill rate
+        if v <= 0:
+            raise ValueError("Rate limits must refill at more than 0 tokens per second")
+        return v
+    
+    @validator("RATE_LIMIT_USER_BURST", "RATE_LIMIT_CHANNEL_BURST")
+    def check_rate_limit_burst(cls, v):
+        if v < 1:
+            raise ValueError("Rate limit bursts must hold at least 1 token")
+        return v
+    
     @property
     def is_production(self) -> bool:
         return os.getenv("RENDER") is not None or self.ENVIRONMENT == "production"
@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload, joinedload
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable
 from uuid import UUID
 
 from app.models.channel import Channel, ChannelType
@@ -9,14 +9,12 @@ from app.schemas.channel import ChannelCreate, ChannelUpdate
 
 async def get_channel(db: AsyncSession, channel_id: UUID) -> Optional[Channel]:
     """
-    Get a channel by ID with related data.
+    Get a channel by ID. Message paths only need its group, see
+    `services.channel_registry`.
     """
     result = await db.execute(
         select(Channel)
         .where(Channel.id == channel_id)
-        .options(
-            joinedload(Channel.group),
-        )
     )
     return result.scalars().first()
 
@@ -34,6 +32,21 @@ async def get_channels_by_group(
     )
     return result.scalars().all()
 
+async def get_channel_group_map(
+    db: AsyncSession, group_ids: Iterable[UUID]
+) -> Dict[UUID, UUID]:
+    """
+    Map channel ID -> group ID for every channel in the given groups.
+    """
+    group_ids = list(group_ids)
+    if not group_ids:
+        return {}
+    result = await db.execute(
+        select(Channel.id, Channel.group_id)
+        .where(Channel.group_id.in_(group_ids))
+    )
+    return {row.id: row.group_id for row in result}
+
 async def create_channel(
     db: AsyncSession, channel_in: ChannelCreate
 ) -> Channel:
@@ -1,14 +1,94 @@
+from sqlalchemy import DateTime, Row, and_, delete, func, insert, literal, or_, tuple_, union
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from typing import Optional, List
+from sqlalchemy.orm import aliased, selectinload
+from typing import Dict, Iterable, Optional, List, Tuple
+from datetime import datetime
 from uuid import UUID
+import base64
 
-from app.models.user import User
-from app.models.group import Group
+from app.db.types import GUID
+from app.models.user import User, user_group
+from app.models.group import Group, general_group_exclusions
 from app.models.channel import Channel, ChannelType
+from app.models.invitation import Invitation
+from app.models.message import Message
+from app.models.message_archive import MessageArchiveSegment
+from app.models.read_marker import ChannelReadMarker
 from app.schemas.group import GroupCreate, GroupUpdate
 
+# General groups are virtual: every registered user (one who redeemed an
+# invitation, or a superuser) is a member without a user_group row, demo
+# accounts excepted, unless they left it: leaving stores an exclusion row.
+# The Demo Lounge keeps explicit memberships.
+DEMO_LOUNGE_NAME = "Demo Lounge"
+DEMO_EMAIL_DOMAIN = "@demo.strangers.club"
+
+# Member pages are ordered by one of these; a cursor is the last member's
+# (username or joined_at ISO timestamp, user ID)
+MEMBER_ORDERS = ("username", "joined_at")
+MemberCursor = Tuple[str, UUID]
+
+
+def is_virtual_group(group: Group) -> bool:
+    return bool(group.is_general) and group.name != DEMO_LOUNGE_NAME
+
+
+def virtual_group_clause():
+    """SQL counterpart of `is_virtual_group` over `Group`."""
+    return and_(Group.is_general == True, Group.name != DEMO_LOUNGE_NAME)
+
+
+def implied_member_clause(group_id=None):
+    """
+    Filter over `User` selecting the implied members of virtual groups:
+    active, non-demo users who are superusers or have redeemed an
+    invitation. Signing in with Google alone does not make a member.
+
+    With `group_id` (a value or a correlated column), users who left that
+    group are left out too.
+    """
+    redeemed = (
+        select(Invitation.id)
+        .where(Invitation.invitee_id == User.id, Invitation.is_used == True)
+        .exists()
+    )
+    clause = and_(
+        User.is_active == True,
+        ~User.email.endswith(DEMO_EMAIL_DOMAIN),
+        or_(User.is_superuser == True, redeemed)
+    )
+    if group_id is None:
+        return clause
+    excluded = (
+        select(general_group_exclusions.c.user_id)
+        .where(general_group_exclusions.c.group_id == group_id, general_group_exclusions.c.user_id == User.id)
+        .exists()
+    )
+    return and_(clause, ~excluded)
+
+
+async def is_implied_member(db: AsyncSession, user_id: UUID, group_id: Optional[UUID] = None) -> bool:
+    """Whether a user belongs to every virtual group, or to `group_id` if given (`implied_member_clause`)."""
+    result = await db.execute(
+        select(select(User.id).where(User.id == user_id, implied_member_clause(group_id)).exists())
+    )
+    return bool(result.scalar())
+
+
+def member_group_ids(user_id: UUID):
+    """
+    Subquery of the IDs of every group a user belongs to: their user_group
+    rows plus, if they are an implied member, the virtual groups.
+    """
+    return union(
+        select(user_group.c.group_id).where(user_group.c.user_id == user_id),
+        select(Group.id).where(
+            virtual_group_clause(),
+            select(User.id).where(User.id == user_id, implied_member_clause(Group.id)).exists()
+        )
+    )
+
 
 async def get_group(db: AsyncSession, group_id: UUID) -> Optional[Group]:
     """
@@ -26,44 +106,231 @@ async def get_group(db: AsyncSession, group_id: UUID) -> Optional[Group]:
     return result.scalars().first()
 
 
+async def get_group_summary(db: AsyncSession, group_id: UUID) -> Optional[Group]:
+    """
+    Get a group with its owner, without loading members or channels.
+    """
+    result = await db.execute(
+        select(Group)
+        .where(Group.id == group_id)
+        .options(selectinload(Group.owner))
+    )
+    return result.scalars().first()
+
+
+async def is_member(db: AsyncSession, group_id: UUID, user_id: UUID) -> bool:
+    """
+    Whether a user belongs to a group: an EXISTS probe of the user_group
+    primary key, or of the group being virtual and the user an implied
+    member. Use `services.membership` for request authorization.
+    """
+    result = await db.execute(
+        select(or_(
+            select(user_group.c.user_id)
+            .where(user_group.c.user_id == user_id, user_group.c.group_id == group_id)
+            .exists(),
+            and_(
+                select(Group.id).where(Group.id == group_id, virtual_group_clause()).exists(),
+                select(User.id).where(User.id == user_id, implied_member_clause(group_id)).exists()
+            )
+        ))
+    )
+    return bool(result.scalar())
+
+
+async def get_member_group_ids(db: AsyncSession, user_id: UUID) -> List[UUID]:
+    """
+    IDs of every group a user belongs to, virtual groups included.
+    """
+    result = await db.execute(member_group_ids(user_id))
+    return list(result.scalars().all())
+
+
+async def get_member_counts(
+    db: AsyncSession, group_ids: Iterable[UUID]
+) -> Dict[UUID, int]:
+    """
+    Map group ID -> number of members, in one grouped COUNT over
+    user_group. Groups without members are missing from the result.
+
+    Virtual groups count the implied members once, less those who left
+    each group, plus their rows for anyone else (e.g. a demo owner).
+    """
+    group_ids = list(group_ids)
+    if not group_ids:
+        return {}
+    result = await db.execute(
+        select(Group.id).where(Group.id.in_(group_ids), virtual_group_clause())
+    )
+    virtual_ids = set(result.scalars().all())
+
+    counts: Dict[UUID, int] = {}
+    explicit_ids = [group_id for group_id in group_ids if group_id not in virtual_ids]
+    if explicit_ids:
+        result = await db.execute(
+            select(user_group.c.group_id, func.count())
+            .where(user_group.c.group_id.in_(explicit_ids))
+            .group_by(user_group.c.group_id)
+        )
+        counts.update(result.all())
+    if virtual_ids:
+        implied = await db.scalar(select(func.count()).select_from(User).where(implied_member_clause()))
+        result = await db.execute(
+            select(user_group.c.group_id, func.count())
+            .join(User, User.id == user_group.c.user_id)
+            .where(user_group.c.group_id.in_(virtual_ids), ~implied_member_clause())
+            .group_by(user_group.c.group_id)
+        )
+        extra = dict(result.all())
+        result = await db.execute(
+            select(general_group_exclusions.c.group_id, func.count())
+            .join(User, User.id == general_group_exclusions.c.user_id)
+            .where(general_group_exclusions.c.group_id.in_(virtual_ids), implied_member_clause())
+            .group_by(general_group_exclusions.c.group_id)
+        )
+        left = dict(result.all())
+        for group_id in virtual_ids:
+            counts[group_id] = implied - left.get(group_id, 0) + extra.get(group_id, 0)
+    return counts
+
+
+async def _with_member_counts(db: AsyncSession, groups: List[Group]) -> List[Group]:
+    """Set `member_count` on groups loaded without their members."""
+    counts = await get_member_counts(db, [group.id for group in groups])
+    for group in groups:
+        group.member_count = counts.get(group.id, 0)
+    return groups
+
+
+def _member_clause(group: Group):
+    """Filter over `User` selecting the members of a group."""
+    rows = select(user_group.c.user_id).where(user_group.c.group_id == group.id)
+    if is_virtual_group(group):
+        return or_(implied_member_clause(group.id), User.id.in_(rows))
+    return User.id.in_(rows)
+
+
+def encode_member_cursor(member, order_by: str) -> str:
+    """
+    Encode a member row's position in `order_by` order as an opaque,
+    URL-safe cursor.
+    """
+    key = member.username if order_by == "username" else member.joined_at.isoformat()
+    raw = f"{key}|{member.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_member_cursor(cursor: str, order_by: str) -> MemberCursor:
+    """
+    Decode a cursor produced by encode_member_cursor. Raises ValueError if malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, user_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        if order_by == "joined_at":
+            datetime.fromisoformat(key)
+        return key, UUID(user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def get_group_members(
+    db: AsyncSession,
+    group: Group,
+    limit: int = 50,
+    order_by: str = "username",
+    prefix: Optional[str] = None,
+    after: Optional[MemberCursor] = None
+) -> List[Row]:
+    """
+    One page of a group's members as (id, username, joined_at) rows,
+    ordered by username or by join time (`MEMBER_ORDERS`) and continuing
+    after a cursor, so only `limit` users are ever read.
+
+    `prefix` keeps usernames starting with it (case-sensitive). Members of
+    a virtual group joined when they signed up. Username pages walk the
+    unique username index; join-time pages walk the (group_id, joined_at,
+    user_id) index of user_group, or users' (created_at, id) for a virtual
+    group.
+    """
+    if is_virtual_group(group):
+        joined_at = User.created_at
+        stmt = select(User.id, User.username, joined_at.label("joined_at")).where(_member_clause(group))
+        anchor = aliased(User)
+        anchor_joined_at = lambda user_id: select(anchor.created_at).where(anchor.id == user_id)
+    else:
+        joined_at = user_group.c.joined_at
+        stmt = (
+            select(User.id, User.username, joined_at.label("joined_at"))
+            .join(user_group, user_group.c.user_id == User.id)
+            .where(user_group.c.group_id == group.id)
+        )
+        anchor = user_group.alias()
+        anchor_joined_at = lambda user_id: select(anchor.c.joined_at).where(
+            anchor.c.group_id == group.id, anchor.c.user_id == user_id
+        )
+
+    if prefix:
+        # The range lets the username index bound the scan; LIKE alone would not
+        stmt = stmt.where(
+            User.username >= prefix,
+            User.username < prefix + "\uffff",
+            User.username.startswith(prefix, autoescape=True)
+        )
+
+    if order_by == "username":
+        if after is not None:
+            stmt = stmt.where(User.username > after[0])
+        stmt = stmt.order_by(User.username)
+    else:
+        if after is not None:
+            # Compare with the stored timestamp, as history cursors do; the encoded one is a fallback
+            key = tuple_(
+                func.coalesce(
+                    anchor_joined_at(after[1]).scalar_subquery(),
+                    literal(datetime.fromisoformat(after[0]), DateTime(timezone=True))
+                ),
+                literal(after[1], GUID())
+            )
+            stmt = stmt.where(tuple_(joined_at, User.id) > key)
+        stmt = stmt.order_by(joined_at, User.id)
+
+    result = await db.execute(stmt.limit(limit))
+    return list(result.all())
+
+
 async def get_user_groups(
     db: AsyncSession, user_id: UUID, skip: int = 0, limit: int = 100
 ) -> List[Group]:
     """
-    Get groups for a specific user, eagerly loading members and owners.
-    This uses the correct 'any' operator for filtering and 'selectinload' for performance.
+    Get groups for a specific user with their owners and member counts.
+    Member lists are not loaded: a general group holds every user.
     """
     stmt = (
         select(Group)
-        .where(Group.members.any(User.id == user_id))
-        .options(
-            selectinload(Group.owner),
-            selectinload(Group.members)
-        )
+        .where(Group.id.in_(member_group_ids(user_id)))
+        .options(selectinload(Group.owner))
         .offset(skip)
         .limit(limit)
     )
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return await _with_member_counts(db, list(result.scalars().all()))
 
 
 async def get_owned_groups(
     db: AsyncSession, owner_id: UUID, skip: int = 0, limit: int = 100
 ) -> List[Group]:
     """
-    Get groups owned by a specific user, eagerly loading members.
+    Get groups owned by a specific user with their member counts.
     """
     result = await db.execute(
         select(Group)
         .where(Group.owner_id == owner_id)
-        .options(
-            selectinload(Group.owner),
-            selectinload(Group.members)
-        )
+        .options(selectinload(Group.owner))
         .offset(skip)
         .limit(limit)
     )
-    return result.scalars().all()
+    return await _with_member_counts(db, list(result.scalars().all()))
 
 
 async def create_group(
@@ -71,7 +338,8 @@ async def create_group(
 ) -> Group:
     """
     Create a new group with a default general channel.
-    If it's a general group, automatically add all existing users.
+    A general group is virtual: existing and future users are members
+    without any user_group rows being written.
     """
     # First, get the owner object from the DB
     owner = await db.get(User, owner_id)
@@ -86,26 +354,13 @@ async def create_group(
         meetup_date=group_in.meetup_date,
         owner_id=owner_id
     )
-    
-    # Add owner as a member
-    db_group.members.append(owner)
-    
-    # If this is a general group, add ALL existing users to it
-    if group_in.is_general:
-        # Get all active users
-        result = await db.execute(
-            select(User).where(User.is_active == True)
-        )
-        all_users = result.scalars().all()
-        
-        # Add all users to the group (except owner who is already added)
-        for user in all_users:
-            if user.id != owner_id:
-                db_group.members.append(user)
-    
     db.add(db_group)
     await db.flush()
     
+    # Add owner as a member, unless the group already implies it
+    if not (is_virtual_group(db_group) and await is_implied_member(db, owner_id)):
+        await db.execute(insert(user_group).values(user_id=owner_id, group_id=db_group.id))
+    
     # Create a default general channel for the group
     default_channel = Channel(
         name="general",
@@ -117,7 +372,8 @@ async def create_group(
     
     await db.commit()
     # Eagerly load relationships on the newly created object
-    await db.refresh(db_group, attribute_names=['owner', 'members', 'channels'])
+    await db.refresh(db_group, attribute_names=['owner', 'channels'])
+    await _with_member_counts(db, [db_group])
     return db_group
 
 
@@ -126,8 +382,16 @@ async def update_group(
 ) -> Group:
     """
     Update a group.
+
+    Raises ValueError for changes that would turn virtual membership on or
+    off (`is_general`, or a rename to or from the Demo Lounge): no
+    user_group rows back either side of such a change.
     """
     group_data = group_in.model_dump(exclude_unset=True)
+    if "is_general" in group_data and bool(group_data["is_general"]) != bool(db_group.is_general):
+        raise ValueError("A group cannot be switched to or from a general group")
+    if "name" in group_data and (group_data["name"] == DEMO_LOUNGE_NAME) != (db_group.name == DEMO_LOUNGE_NAME):
+        raise ValueError(f"A group cannot be renamed to or from {DEMO_LOUNGE_NAME}")
     for key, value in group_data.items():
         setattr(db_group, key, value)
     
@@ -138,12 +402,26 @@ async def update_group(
 
 async def delete_group(db: AsyncSession, *, group_id: UUID) -> Optional[Group]:
     """
-    Delete a group.
+    Delete a group with its channels, their live and archived messages
+    and read markers, its invitations and memberships. The returned group
+    keeps its loaded channels, for invalidating caches after the commit.
     """
     group = await get_group(db, group_id)
-    if group:
-        await db.delete(group)
-        await db.commit()
+    if not group:
+        return None
+    channel_ids = select(Channel.id).where(Channel.group_id == group_id)
+    for stmt in (
+        delete(Message).where(Message.channel_id.in_(channel_ids)),
+        delete(MessageArchiveSegment).where(MessageArchiveSegment.channel_id.in_(channel_ids)),
+        delete(ChannelReadMarker).where(ChannelReadMarker.channel_id.in_(channel_ids)),
+        delete(Channel).where(Channel.group_id == group_id),
+        delete(Invitation).where(Invitation.group_id == group_id),
+        delete(user_group).where(user_group.c.group_id == group_id),
+        delete(general_group_exclusions).where(general_group_exclusions.c.group_id == group_id),
+        delete(Group).where(Group.id == group_id)
+    ):
+        await db.execute(stmt.execution_options(synchronize_session=False))
+    await db.commit()
     return group
 
 
@@ -151,66 +429,56 @@ async def add_user_to_group(
     db: AsyncSession, group_id: UUID, user_id: UUID
 ) -> Optional[Group]:
     """
-    Add a user to a group.
+    Add a user to a group; nothing happens if they are already a member.
+    Implied members of a virtual group get no row: rejoining only drops
+    the exclusion they left it with.
     """
-    group = await get_group(db, group_id)
+    group = await get_group_summary(db, group_id)
     user = await db.get(User, user_id)
-    
     if not group or not user:
         return None
+    if is_virtual_group(group):
+        await db.execute(
+            delete(general_group_exclusions)
+            .where(general_group_exclusions.c.group_id == group_id, general_group_exclusions.c.user_id == user_id)
+        )
+        if await is_implied_member(db, user_id):
+            await db.commit()
+            return group
     
-    # Check if user is already a member
-    if user.id not in [member.id for member in group.members]:
-        group.members.append(user)
-        await db.commit()
-        await db.refresh(group, attribute_names=['members'])
-    
+    await db.execute(
+        _insert_ignore(db, user_group).values(user_id=user_id, group_id=group_id)
+    )
+    await db.commit()
     return group
 
 
 async def remove_user_from_group(
     db: AsyncSession, group_id: UUID, user_id: UUID
-) -> Optional[Group]:
+) -> bool:
     """
-    Remove a user from a group.
+    Remove a user from a group. Implied members of a virtual group are
+    excluded from it instead. Returns False if they were not a member.
     """
-    group = await get_group(db, group_id)
-    
-    user_to_remove = next((member for member in group.members if member.id == user_id), None)
-
-    if not group or not user_to_remove:
-        return None
-    
-    group.members.remove(user_to_remove)
+    result = await db.execute(
+        delete(user_group)
+        .where(user_group.c.group_id == group_id, user_group.c.user_id == user_id)
+    )
+    removed = result.rowcount > 0
+    group = await get_group_summary(db, group_id)
+    if group and is_virtual_group(group) and await is_implied_member(db, user_id, group_id):
+        await db.execute(
+            _insert_ignore(db, general_group_exclusions).values(group_id=group_id, user_id=user_id)
+        )
+        removed = True
     await db.commit()
-    await db.refresh(group, attribute_names=['members'])
-    
-    return group
+    return removed
 
 
-async def add_new_user_to_general_groups(db: AsyncSession, user_id: UUID) -> None:
-    """
-    Add a newly registered user to all existing general groups.
-    This should be called when a user completes registration.
-    """
-    # Get all general groups — exclude Demo Lounge so real users are never mixed in
-    result = await db.execute(
-        select(Group)
-        .where(Group.is_general == True)
-        .where(Group.name != "Demo Lounge")
-        .options(selectinload(Group.members))
-    )
-    general_groups = result.scalars().all()
-    
-    # Get the user
-    user = await db.get(User, user_id)
-    if not user:
-        return
-    
-    # Add user to each general group if not already a member
-    for group in general_groups:
-        member_ids = [member.id for member in group.members]
-        if user.id not in member_ids:
-            group.members.append(user)
-    
-    await db.commit()
\ No newline at end of file
+def _insert_ignore(db: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING for the database in use."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table).on_conflict_do_nothing()
@@ -1,12 +1,69 @@
+from sqlalchemy import DateTime, and_, column, func, literal, literal_column, or_, table, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from typing import Optional, List
+from typing import AsyncIterator, NamedTuple, Optional, List, Sequence, Tuple
+from datetime import datetime
 from uuid import UUID
+import base64
+import html
+import re
 
+from app.crud.group import implied_member_clause, member_group_ids, virtual_group_clause
+from app.db.types import GUID
+from app.models.channel import Channel
+from app.models.group import Group
 from app.models.message import Message
+from app.models.user import User, user_group
 from app.schemas.message import MessageCreate, MessageUpdate
 
+# A history cursor is the (created_at, id) sort key of a message
+Cursor = Tuple[datetime, UUID]
+
+# Search snippets are highlighted with these control characters in SQL and
+# turned into <mark> tags after HTML-escaping the text around them
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+# Words of a search query that are used; the rest are ignored
+MAX_SEARCH_TERMS = 8
+
+# The FTS5 index over messages.content (SQLite), see the c5d8e1f3a7b2 migration
+_messages_fts = table("messages_fts", column("rowid"))
+
+def encode_cursor(message: Message) -> str:
+    """
+    Encode a message's sort key as an opaque, URL-safe cursor.
+    """
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor produced by encode_cursor. Raises ValueError if malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _cursor_key(cursor: Cursor):
+    """
+    Build the row-value (created_at, id) for a cursor.
+
+    The timestamp is re-read from the anchor row when it still exists so the
+    comparison uses the stored value rather than a re-serialized one; the
+    encoded timestamp is only a fallback for deleted anchors.
+    """
+    created_at, message_id = cursor
+    anchor_id = literal(message_id, GUID())
+    anchor_created_at = func.coalesce(
+        select(Message.created_at).where(Message.id == anchor_id).scalar_subquery(),
+        literal(created_at, DateTime(timezone=True))
+    )
+    return tuple_(anchor_created_at, anchor_id)
+
 async def get_message(db: AsyncSession, message_id: UUID) -> Optional[Message]:
     """
     Get a message by ID with related data.
@@ -21,21 +78,191 @@ async def get_message(db: AsyncSession, message_id: UUID) -> Optional[Message]:
     )
     return result.scalars().first()
 
+class MessageAccess(NamedTuple):
+    """A message plus what deciding who may change it requires."""
+    message: Message
+    group_id: UUID
+    group_owner_id: UUID
+    # Whether the caller is a member of the message's group
+    is_member: bool
+
+    def can_edit(self, user_id: UUID) -> bool:
+        return self.is_member and self.message.author_id == user_id
+
+    def can_delete(self, user_id: UUID) -> bool:
+        return self.group_owner_id == user_id or self.can_edit(user_id)
+
+async def get_message_access(db: AsyncSession, message_id: UUID, user_id: UUID) -> Optional[MessageAccess]:
+    """
+    Resolve a message and the caller's rights over it in one query: the
+    message with its author, the owner of its group and an EXISTS probe of
+    the caller's membership, instead of loading the channel, the group
+    and its whole member list.
+    """
+    is_member = or_(
+        select(user_group.c.user_id)
+        .where(user_group.c.group_id == Channel.group_id, user_group.c.user_id == user_id)
+        .exists(),
+        and_(
+            virtual_group_clause(),
+            select(User.id).where(User.id == user_id, implied_member_clause(Channel.group_id)).exists()
+        )
+    )
+    result = await db.execute(
+        select(Message, Channel.group_id, Group.owner_id, is_member)
+        .join(Channel, Channel.id == Message.channel_id)
+        .join(Group, Group.id == Channel.group_id)
+        .where(Message.id == message_id)
+        .options(joinedload(Message.author))
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return MessageAccess(*row)
+
 async def get_messages_by_channel(
-    db: AsyncSession, channel_id: UUID, skip: int = 0, limit: int = 50
+    db: AsyncSession,
+    channel_id: UUID,
+    skip: int = 0,
+    limit: int = 50,
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None
 ) -> List[Message]:
     """
-    Get messages for a specific channel with pagination.
+    Get messages for a specific channel, newest first.
+
+    With no cursor this pages by offset. With `before` it returns the page
+    of messages older than the cursor, with `after` the page newer than it;
+    both seek on the (channel_id, created_at, id) index so deep pages cost
+    the same as the first one.
     """
-    result = await db.execute(
+    stmt = (
         select(Message)
         .where(Message.channel_id == channel_id)
         .options(joinedload(Message.author))
-        .order_by(Message.created_at.desc())
-        .offset(skip)
-        .limit(limit)
     )
-    return result.scalars().all()
+    sort_key = tuple_(Message.created_at, Message.id)
+
+    if after is not None:
+        # Seek forward from the cursor, then flip back to newest first
+        result = await db.execute(
+            stmt.where(sort_key > _cursor_key(after))
+            .order_by(Message.created_at.asc(), Message.id.asc())
+            .limit(limit)
+        )
+        messages = list(result.scalars().all())
+        messages.reverse()
+        return messages
+
+    if before is not None:
+        stmt = stmt.where(sort_key < _cursor_key(before))
+    else:
+        stmt = stmt.offset(skip)
+
+    result = await db.execute(
+        stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+    )
+    return list(result.scalars().all())
+
+def search_terms(query: str) -> List[str]:
+    """
+    Split a search query into the words that are matched. Punctuation is
+    dropped, so no input can produce an invalid full-text query.
+    """
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+def render_snippet(snippet: str) -> str:
+    """
+    HTML-escape a search snippet and mark its matches with <mark> tags.
+    """
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: UUID,
+    terms: List[str],
+    channel_id: Optional[UUID] = None,
+    group_id: Optional[UUID] = None,
+    limit: int = 20,
+    before: Optional[Cursor] = None
+) -> List[Tuple[Message, str]]:
+    """
+    Full-text search over the messages of the channels in the user's
+    groups, newest first, paged with the history cursors.
+
+    Every term must match; the last one also matches as a prefix, so
+    results follow the user as they type. Returns (message, snippet)
+    pairs with matches wrapped in the _MARK_START/_MARK_END markers.
+    Uses the FTS5 table on SQLite and the GIN-indexed `search_vector`
+    column on PostgreSQL.
+    """
+    visible_channels = (
+        select(Channel.id)
+        .where(Channel.group_id.in_(member_group_ids(user_id)))
+    )
+    if group_id is not None:
+        visible_channels = visible_channels.where(Channel.group_id == group_id)
+    if channel_id is not None:
+        visible_channels = visible_channels.where(Channel.id == channel_id)
+
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.to_tsquery(
+            literal_column("'simple'::regconfig"),
+            " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        )
+        snippet = func.ts_headline(
+            literal_column("'simple'::regconfig"), Message.content, tsquery,
+            f'StartSel="{_MARK_START}", StopSel="{_MARK_END}", MaxWords=24, MinWords=8'
+        )
+        stmt = select(Message, snippet).where(literal_column("messages.search_vector").op("@@")(tsquery))
+    else:
+        match = " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        snippet = func.snippet(literal_column("messages_fts"), 0, _MARK_START, _MARK_END, "…", 16)
+        stmt = (
+            select(Message, snippet)
+            .join(_messages_fts, _messages_fts.c.rowid == literal_column("messages.rowid"))
+            .where(text("messages_fts MATCH :fts_query").bindparams(fts_query=match))
+        )
+
+    stmt = (
+        stmt.where(Message.channel_id.in_(visible_channels))
+        .options(joinedload(Message.author))
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < _cursor_key(before))
+
+    result = await db.execute(
+        stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+    )
+    return [(message, snippet) for message, snippet in result.all()]
+
+async def stream_channel_messages(
+    db: AsyncSession, channel_id: UUID, batch_size: int = 1000
+) -> AsyncIterator[Sequence]:
+    """
+    Yield a channel's whole history, oldest first, in batches of rows
+    (id, created_at, updated_at, author_id, author_username, content).
+
+    Reads through a server-side cursor (`stream` with `yield_per`) and
+    plain column tuples rather than ORM objects, so memory stays at one
+    batch however long the channel is.
+    """
+    result = await db.stream(
+        select(
+            Message.id,
+            Message.created_at,
+            Message.updated_at,
+            Message.author_id,
+            User.username.label("author_username"),
+            Message.content
+        )
+        .join(User, User.id == Message.author_id)
+        .where(Message.channel_id == channel_id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+        .execution_options(yield_per=batch_size)
+    )
+    async for batch in result.partitions():
+        yield batch
 
 async def get_messages_by_user(
     db: AsyncSession, user_id: UUID, skip: int = 0, limit: int = 50
@@ -83,12 +310,10 @@ async def update_message(
     await db.refresh(db_message)
     return db_message
 
-async def delete_message(db: AsyncSession, *, message_id: UUID) -> Optional[Message]:
+async def delete_message(db: AsyncSession, *, db_message: Message) -> Message:
     """
     Delete a message.
     """
-    message = await get_message(db, message_id)
-    if message:
-        await db.delete(message)
-        await db.commit()
-    return message
\ No newline at end of file
+    await db.delete(db_message)
+    await db.commit()
+    return db_message
\ No newline at end of file
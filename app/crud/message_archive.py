@@ -0,0 +1,328 @@
+from sqlalchemy import DateTime, delete, literal, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Sequence, Tuple
+from datetime import datetime
+from uuid import UUID
+import json
+import zlib
+
+from app.crud import group as crud_group
+from app.crud.message import MessageAccess
+from app.db.types import GUID
+from app.models.channel import Channel
+from app.models.group import Group
+from app.models.message import Message
+from app.models.message_archive import MessageArchiveSegment
+from app.models.user import User
+
+# A history cursor is the (created_at, id) sort key of a message, as in crud.message
+Cursor = Tuple[datetime, UUID]
+
+class ArchivedRow(NamedTuple):
+    """One message as stored in a segment."""
+    id: UUID
+    author_id: UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    content: str
+
+class ArchivedMessage(NamedTuple):
+    """
+    An archived message shaped like a Message row, so it serializes with
+    the Message schema and can be passed to `encode_cursor`.
+    """
+    id: UUID
+    content: str
+    author_id: UUID
+    channel_id: UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    author: Optional[User]
+
+def _pack(rows: Sequence[ArchivedRow]) -> bytes:
+    return zlib.compress(json.dumps([
+        [
+            str(row.id),
+            str(row.author_id),
+            row.created_at.isoformat(),
+            row.updated_at.isoformat() if row.updated_at else None,
+            row.content
+        ]
+        for row in rows
+    ], separators=(",", ":")).encode())
+
+def _unpack(segment: MessageArchiveSegment) -> List[ArchivedRow]:
+    return [
+        ArchivedRow(
+            UUID(message_id),
+            UUID(author_id),
+            datetime.fromisoformat(created_at),
+            datetime.fromisoformat(updated_at) if updated_at else None,
+            content
+        )
+        for message_id, author_id, created_at, updated_at, content in json.loads(zlib.decompress(segment.payload))
+    ]
+
+def _write(segment: MessageArchiveSegment, rows: Sequence[ArchivedRow]) -> None:
+    """Store rows (oldest first) in a segment and update its bounds."""
+    segment.first_created_at = rows[0].created_at
+    segment.first_message_id = rows[0].id
+    segment.last_created_at = rows[-1].created_at
+    segment.last_message_id = rows[-1].id
+    segment.message_count = len(rows)
+    segment.author_ids = " ".join(sorted({str(row.author_id) for row in rows}))
+    segment.payload = _pack(rows)
+
+def _key(cursor: Cursor):
+    created_at, message_id = cursor
+    return tuple_(literal(created_at, DateTime(timezone=True)), literal(message_id, GUID()))
+
+def _sort_key(row: ArchivedRow) -> Cursor:
+    return row.created_at, row.id
+
+async def _segment(
+    db: AsyncSession, channel_id: UUID, condition=None, newest: bool = True, for_update: bool = False
+) -> Optional[MessageArchiveSegment]:
+    """
+    The newest (or oldest) segment of a channel whose first key matches
+    `condition`, optionally row-locked (and re-read) until commit.
+    """
+    stmt = select(MessageArchiveSegment).where(MessageArchiveSegment.channel_id == channel_id)
+    if for_update:
+        stmt = stmt.with_for_update().execution_options(populate_existing=True)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    if newest:
+        stmt = stmt.order_by(MessageArchiveSegment.first_created_at.desc(), MessageArchiveSegment.first_message_id.desc())
+    else:
+        stmt = stmt.order_by(MessageArchiveSegment.first_created_at.asc(), MessageArchiveSegment.first_message_id.asc())
+    result = await db.execute(stmt.limit(1))
+    return result.scalars().first()
+
+async def get_archived_messages(
+    db: AsyncSession,
+    channel_id: UUID,
+    limit: int = 50,
+    before: Optional[Cursor] = None,
+    after: Optional[Cursor] = None
+) -> List[ArchivedMessage]:
+    """
+    Get archived messages of a channel, newest first, paged with the same
+    cursors as `get_messages_by_channel`: with `before` the page older than
+    the cursor (the newest archived messages if it is None), with `after`
+    the page newer than it.
+
+    Segments are read one at a time, seeking on the (channel_id,
+    first_created_at, first_message_id) index, so a page costs one or two
+    index lookups and decompressions however old it is.
+    """
+    first_key = tuple_(MessageArchiveSegment.first_created_at, MessageArchiveSegment.first_message_id)
+    rows: List[ArchivedRow] = []
+
+    if after is not None:
+        # The segment holding the cursor, then newer ones, oldest first. Check
+        # its bounds before loading it: usually the cursor is past the archive.
+        result = await db.execute(
+            select(MessageArchiveSegment.id, MessageArchiveSegment.last_created_at, MessageArchiveSegment.last_message_id)
+            .where(MessageArchiveSegment.channel_id == channel_id, first_key <= _key(after))
+            .order_by(MessageArchiveSegment.first_created_at.desc(), MessageArchiveSegment.first_message_id.desc())
+            .limit(1)
+        )
+        holding = result.first()
+        segment = None
+        if holding is not None and (holding.last_created_at, holding.last_message_id) > after:
+            segment = await db.get(MessageArchiveSegment, holding.id)
+        if segment is None:
+            segment = await _segment(db, channel_id, first_key > _key(after), newest=False)
+        while segment is not None and len(rows) < limit:
+            rows.extend(row for row in _unpack(segment) if _sort_key(row) > after)
+            segment = await _segment(
+                db, channel_id,
+                first_key > _key((segment.first_created_at, segment.first_message_id)),
+                newest=False
+            )
+        rows = rows[:limit]
+        rows.reverse()
+    else:
+        segment = await _segment(db, channel_id, first_key < _key(before) if before else None)
+        while segment is not None and len(rows) < limit:
+            newer_first = reversed(_unpack(segment))
+            rows.extend(row for row in newer_first if before is None or _sort_key(row) < before)
+            segment = await _segment(
+                db, channel_id,
+                first_key < _key((segment.first_created_at, segment.first_message_id))
+            )
+        rows = rows[:limit]
+
+    authors = {}
+    if rows:
+        result = await db.execute(select(User).where(User.id.in_({row.author_id for row in rows})))
+        authors = {user.id: user for user in result.scalars().all()}
+    return [
+        ArchivedMessage(row.id, row.content, row.author_id, channel_id, row.created_at, row.updated_at, authors.get(row.author_id))
+        for row in rows
+    ]
+
+async def stream_archived_messages(db: AsyncSession, channel_id: UUID) -> AsyncIterator[List[Tuple[Any, ...]]]:
+    """
+    Yield a channel's archived history, oldest first, one segment at a
+    time, as rows shaped like those of `stream_channel_messages`
+    (id, created_at, updated_at, author_id, author_username, content).
+    """
+    result = await db.execute(
+        select(MessageArchiveSegment.id)
+        .where(MessageArchiveSegment.channel_id == channel_id)
+        .order_by(MessageArchiveSegment.first_created_at.asc(), MessageArchiveSegment.first_message_id.asc())
+    )
+    for segment_id in result.scalars().all():
+        segment = await db.get(MessageArchiveSegment, segment_id)
+        if segment is None:
+            continue
+        rows = _unpack(segment)
+        users = await db.execute(
+            select(User.id, User.username).where(User.id.in_({row.author_id for row in rows}))
+        )
+        usernames = dict(users.all())
+        yield [
+            (row.id, row.created_at, row.updated_at, row.author_id, usernames.get(row.author_id), row.content)
+            for row in rows
+        ]
+        # Segments are large; do not keep them in the identity map
+        db.expunge(segment)
+
+async def archive_oldest_messages(
+    db: AsyncSession, channel_id: UUID, cutoff: datetime, segment_size: int
+) -> int:
+    """
+    Move the oldest messages of a channel written before `cutoff` into the
+    archive, filling up the channel's newest segment if it has room or
+    starting a new one. Moves at most one segment's worth per call and
+    returns how many messages were moved.
+
+    Archiving always takes the oldest messages still in `messages`, so
+    segments never overlap and every archived message sorts before every
+    live one. Workers archiving the same channel concurrently are
+    serialized on the tail segment's row lock (PostgreSQL); the second
+    one reads the tail as the first committed it, so a top-up never
+    overwrites another worker's. If another worker archived the same
+    messages meanwhile, the delete comes up short and the transaction is
+    rolled back. SQLite serializes writers itself: a worker whose reads
+    went stale fails to write instead.
+    """
+    tail = await _segment(db, channel_id, for_update=True)
+    if tail is not None and tail.message_count >= segment_size:
+        tail = None
+    room = segment_size - tail.message_count if tail is not None else segment_size
+
+    result = await db.execute(
+        select(Message.id, Message.author_id, Message.created_at, Message.updated_at, Message.content)
+        .where(Message.channel_id == channel_id, Message.created_at < cutoff)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+        .limit(room)
+    )
+    moved = [ArchivedRow(*row) for row in result.all()]
+    if not moved:
+        return 0
+
+    deleted = await db.execute(
+        delete(Message)
+        .where(Message.id.in_([row.id for row in moved]))
+        .execution_options(synchronize_session=False)
+    )
+    if deleted.rowcount != len(moved):
+        await db.rollback()
+        return 0
+
+    if tail is not None:
+        _write(tail, _unpack(tail) + moved)
+    else:
+        segment = MessageArchiveSegment(channel_id=channel_id)
+        _write(segment, moved)
+        db.add(segment)
+    await db.commit()
+    return len(moved)
+
+async def purge_author(db: AsyncSession, author_id: UUID) -> List[str]:
+    """
+    Remove an author's messages from the archive, rewriting the segments
+    that hold any and dropping those left empty. Does not commit. Returns
+    the ids of the channels that lost messages.
+    """
+    result = await db.execute(
+        select(MessageArchiveSegment).where(MessageArchiveSegment.author_ids.contains(str(author_id)))
+    )
+    channel_ids = set()
+    for segment in result.scalars().all():
+        rows = _unpack(segment)
+        kept = [row for row in rows if row.author_id != author_id]
+        if len(kept) == len(rows):
+            continue
+        channel_ids.add(str(segment.channel_id))
+        if kept:
+            _write(segment, kept)
+        else:
+            await db.delete(segment)
+    await db.flush()
+    return list(channel_ids)
+
+async def get_archived_message_access(
+    db: AsyncSession, message_id: UUID, user_id: UUID
+) -> Optional[Tuple[MessageAccess, UUID]]:
+    """
+    Find an archived message the caller might delete and resolve their
+    rights over it, as `crud.message.get_message_access` does for live
+    ones. Returns it with the id of its segment, or None.
+
+    Segments are not indexed by message, so only those the caller could
+    delete from are searched: segments of channels in groups they own,
+    and segments holding messages of theirs.
+    """
+    result = await db.execute(
+        select(MessageArchiveSegment.id, Channel.group_id, Group.owner_id)
+        .join(Channel, Channel.id == MessageArchiveSegment.channel_id)
+        .join(Group, Group.id == Channel.group_id)
+        .where(or_(Group.owner_id == user_id, MessageArchiveSegment.author_ids.contains(str(user_id))))
+    )
+    for segment_id, group_id, owner_id in result.all():
+        segment = await db.get(MessageArchiveSegment, segment_id)
+        if segment is None:
+            continue
+        row = next((row for row in _unpack(segment) if row.id == message_id), None)
+        channel_id = segment.channel_id
+        db.expunge(segment)
+        if row is None:
+            continue
+        message = ArchivedMessage(
+            row.id, row.content, row.author_id, channel_id, row.created_at, row.updated_at,
+            await db.get(User, row.author_id)
+        )
+        is_member = await crud_group.is_member(db, group_id, user_id)
+        return MessageAccess(message, group_id, owner_id, is_member), segment_id
+    return None
+
+async def delete_archived_message(db: AsyncSession, segment_id: UUID, message_id: UUID) -> bool:
+    """
+    Remove one message from its segment, rewriting it (or dropping it if
+    left empty) under the same row lock the archiver takes to top it up.
+    Returns False if the message was no longer there.
+    """
+    result = await db.execute(
+        select(MessageArchiveSegment)
+        .where(MessageArchiveSegment.id == segment_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    segment = result.scalars().first()
+    if segment is None:
+        return False
+    rows = _unpack(segment)
+    kept = [row for row in rows if row.id != message_id]
+    if len(kept) == len(rows):
+        return False
+    if kept:
+        _write(segment, kept)
+    else:
+        await db.delete(segment)
+    await db.commit()
+    return True
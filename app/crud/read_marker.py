@@ -0,0 +1,43 @@
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import List
+from uuid import UUID
+
+from app.crud.group import member_group_ids
+from app.models.channel import Channel
+from app.models.message import Message
+from app.models.read_marker import ChannelReadMarker
+
+async def get_unread_counts(db: AsyncSession, user_id: UUID) -> List[dict]:
+    """
+    Unread message counts for every channel in the user's groups, in one
+    aggregate query.
+
+    A message is unread if someone else wrote it after the user's read
+    marker for the channel (every message, if there is no marker). Each
+    channel's count is a range scan of the (channel_id, created_at, id)
+    history index starting at the marker.
+    """
+    marker = ChannelReadMarker.__table__
+    result = await db.execute(
+        select(
+            Channel.id.label("channel_id"),
+            Channel.group_id,
+            marker.c.last_read_message_id,
+            func.count(Message.id).label("unread_count")
+        )
+        .outerjoin(marker, and_(marker.c.channel_id == Channel.id, marker.c.user_id == user_id))
+        .outerjoin(Message, and_(
+            Message.channel_id == Channel.id,
+            Message.author_id != user_id,
+            or_(
+                marker.c.user_id.is_(None),
+                tuple_(Message.created_at, Message.id)
+                > tuple_(marker.c.last_read_at, marker.c.last_read_message_id)
+            )
+        ))
+        .where(Channel.group_id.in_(member_group_ids(user_id)))
+        .group_by(Channel.id, Channel.group_id, marker.c.last_read_message_id)
+    )
+    return [dict(row._mapping) for row in result]
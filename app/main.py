@@ -16,10 +16,21 @@ import sys
 
 from app.api.router import api_router
 from app.config import settings
+from app.crud import message_archive as crud_archive
 from app.db.base import Base, engine, get_db
 from app.models.group import Group
 from app.models.channel import Channel, ChannelType
 from app.models.user import User
+from app.services.channel_registry import channel_registry
+from app.services.connection_manager import manager
+from app.services.membership import membership
+from app.services.message_archiver import message_archiver
+from app.services.message_cache import recent_messages
+from app.services.message_writer import message_writer
+from app.services.read_markers import read_markers
+from app.services.presence import presence
+from app.services.rate_limiter import message_limits
+from app.services.typing_indicators import typing_indicators
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -136,9 +147,36 @@ async def init_db():
                 await session.commit()
                 print("Demo Lounge created")
 
+    # Start receiving chat events published by every worker
+    manager.add_listener(recent_messages.apply)
+    manager.add_listener(presence.apply)
+    manager.add_listener(typing_indicators.apply)
+    manager.add_listener(membership.apply)
+    manager.add_listener(channel_registry.apply)
+    manager.add_disconnect_listener(presence.disconnected)
+    manager.add_disconnect_listener(typing_indicators.disconnected)
+    await channel_registry.warm()
+    await manager.start()
+    presence.start()
+    typing_indicators.start()
+    read_markers.start()
+    message_archiver.start()
+    message_limits.start()
+
     asyncio.create_task(_demo_cleanup_loop())
 
 
+@app.on_event("shutdown")
+async def shutdown_realtime():
+    await message_limits.stop()
+    await message_archiver.stop()
+    await message_writer.stop()
+    await read_markers.stop()
+    await typing_indicators.stop()
+    await presence.stop()
+    await manager.stop()
+
+
 async def _delete_demo_groups(session: AsyncSession, demo_user_id, cutoff=None):
     """Delete demo groups and all related rows using raw SQL to avoid ORM cascade issues."""
     from sqlalchemy import text
@@ -158,13 +196,25 @@ async def _delete_demo_groups(session: AsyncSession, demo_user_id, cutoff=None):
     params = {f"gid_{i}": gid for i, gid in enumerate(group_ids)}
     id_list = ", ".join(f":gid_{i}" for i in range(len(group_ids)))
 
+    result = await session.execute(text(f"SELECT id FROM channels WHERE group_id IN ({id_list})"), params)
+    channel_ids = [row[0] for row in result.fetchall()]
+
     await session.execute(text(f"DELETE FROM messages WHERE channel_id IN (SELECT id FROM channels WHERE group_id IN ({id_list}))"), params)
+    await session.execute(text(f"DELETE FROM message_archive_segments WHERE channel_id IN (SELECT id FROM channels WHERE group_id IN ({id_list}))"), params)
+    await session.execute(text(f"DELETE FROM channel_read_markers WHERE channel_id IN (SELECT id FROM channels WHERE group_id IN ({id_list}))"), params)
     await session.execute(text(f"DELETE FROM channels WHERE group_id IN ({id_list})"), params)
     await session.execute(text(f"DELETE FROM invitations WHERE group_id IN ({id_list})"), params)
     await session.execute(text(f"DELETE FROM user_group WHERE group_id IN ({id_list})"), params)
+    await session.execute(text(f"DELETE FROM general_group_exclusions WHERE group_id IN ({id_list})"), params)
     await session.execute(text(f"DELETE FROM groups WHERE id IN ({id_list})"), params)
     await session.commit()
 
+    # Deleted channels must stop resolving, and members stop being cached, on every worker
+    for gid in group_ids:
+        await membership.changed(group_id=gid)
+    for channel_id in channel_ids:
+        await channel_registry.changed(channel_id)
+
 
 async def _demo_cleanup_loop():
     """Every 5 min: delete demo groups >30 min old. Every 48h: delete all demo users."""
@@ -204,8 +254,15 @@ async def _demo_cleanup_loop():
                             text("DELETE FROM user_group WHERE user_id = :uid"),
                             {"uid": str(du.id)}
                         )
+                        await session.execute(
+                            text("DELETE FROM channel_read_markers WHERE user_id = :uid"),
+                            {"uid": str(du.id)}
+                        )
+                        await crud_archive.purge_author(session, du.id)
                         await session.delete(du)
                     await session.commit()
+                    for du in demo_users:
+                        await membership.changed(user_id=du.id)
                     last_user_cleanup = now
                     print("Demo users purged (48h cycle)")
 
@@ -314,4 +371,7 @@ templates.env = create_jinja2_environment()
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     # Use single worker for development
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=False)
\ No newline at end of file
+    uvicorn.run(
+        "app.main:app", host="0.0.0.0", port=port, reload=False,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE
+    )
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, Float, Text
+
+from app.db.base import Base
+
+class BrokerPayload(Base):
+    """Broker events too large for a NOTIFY payload (PostgreSQL broker backend)."""
+    __tablename__ = "broker_payloads"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    payload = Column(Text, nullable=False)
+    # Unix time of publishing; rows are pruned once every worker has read them
+    created_at = Column(Float, nullable=False)
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,6 +7,15 @@ from app.db.base import Base
 from app.models.user import user_group
 from app.db.types import GUID  # Import the custom GUID type
 
+# Users who left a virtual general group they are otherwise an implied member of
+general_group_exclusions = Table(
+    "general_group_exclusions",
+    Base.metadata,
+    Column("group_id", GUID, ForeignKey("groups.id"), primary_key=True),
+    Column("user_id", GUID, ForeignKey("users.id"), primary_key=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now())
+)
+
 class Group(Base):
     __tablename__ = "groups"
     
@@ -14,7 +14,7 @@ class Invitation(Base):
     id = Column(GUID, primary_key=True, default=uuid.uuid4)  # Use GUID instead of UUID
     code = Column(String, unique=True, index=True, nullable=False)
     inviter_id = Column(GUID, ForeignKey("users.id"), nullable=False)  # Use GUID instead of UUID
-    invitee_id = Column(GUID, ForeignKey("users.id"), nullable=True)  # Use GUID instead of UUID
+    invitee_id = Column(GUID, ForeignKey("users.id"), nullable=True, index=True)  # Use GUID instead of UUID
     group_id = Column(GUID, ForeignKey("groups.id"), nullable=False)  # Use GUID instead of UUID
     is_used = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
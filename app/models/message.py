@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,6 +8,10 @@ from app.db.types import GUID  # Import the custom GUID type
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Backs keyset pagination of channel history: (channel_id, created_at, id)
+        Index("ix_messages_channel_id_created_at_id", "channel_id", "created_at", "id"),
+    )
     
     id = Column(GUID, primary_key=True, default=uuid.uuid4)  # Use GUID instead of UUID
     content = Column(Text, nullable=False)
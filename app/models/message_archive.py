@@ -0,0 +1,32 @@
+import uuid
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, Text
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+from app.db.types import GUID
+
+class MessageArchiveSegment(Base):
+    """
+    A run of consecutive old messages of one channel, moved out of the
+    `messages` table and stored as a single compressed row.
+    """
+    __tablename__ = "message_archive_segments"
+    __table_args__ = (
+        # Seeks to the segment holding a history cursor: (channel_id, first_created_at, first_message_id)
+        Index("ix_message_archive_segments_channel_id_first", "channel_id", "first_created_at", "first_message_id"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    channel_id = Column(GUID, ForeignKey("channels.id", ondelete="CASCADE"), nullable=False)
+    # Sort keys (created_at, id) of the oldest and newest message in the segment
+    first_created_at = Column(DateTime(timezone=True), nullable=False)
+    first_message_id = Column(GUID, nullable=False)
+    last_created_at = Column(DateTime(timezone=True), nullable=False)
+    last_message_id = Column(GUID, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    # Space separated ids of the authors in the segment, to find their messages on account deletion
+    author_ids = Column(Text, nullable=False)
+    # zlib-compressed JSON list of [id, author_id, created_at, updated_at, content], oldest first
+    payload = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Float, String
+
+from app.db.base import Base
+
+class RateLimitBucket(Base):
+    """Token bucket state shared by all workers (database rate-limit backend)."""
+    __tablename__ = "rate_limit_buckets"
+    
+    key = Column(String(128), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix time of the last refill
+    updated_at = Column(Float, nullable=False)
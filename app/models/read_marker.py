@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+from app.db.types import GUID
+
+class ChannelReadMarker(Base):
+    """The last message a user has read in a channel."""
+    __tablename__ = "channel_read_markers"
+    
+    user_id = Column(GUID, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    channel_id = Column(GUID, ForeignKey("channels.id", ondelete="CASCADE"), primary_key=True)
+    # Sort key of the last read message, (created_at, id) like history cursors.
+    # No foreign key: the marker outlives the message being deleted.
+    last_read_at = Column(DateTime(timezone=True), nullable=False)
+    last_read_message_id = Column(GUID, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
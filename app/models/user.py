@@ -1,7 +1,7 @@
 import uuid
 import secrets
 import string
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from typing import List, Optional
@@ -14,7 +14,11 @@ user_group = Table(
     "user_group",
     Base.metadata,
     Column("user_id", GUID, ForeignKey("users.id"), primary_key=True),  # Use GUID instead of UUID
-    Column("group_id", GUID, ForeignKey("groups.id"), primary_key=True)  # Use GUID instead of UUID
+    Column("group_id", GUID, ForeignKey("groups.id"), primary_key=True),  # Use GUID instead of UUID
+    Column("joined_at", DateTime(timezone=True), server_default=func.now()),
+    # The primary key leads with user_id; this serves per-group counts and
+    # member pages in join order
+    Index("ix_user_group_group_id_joined_at", "group_id", "joined_at", "user_id")
 )
 
 class User(Base):
@@ -40,6 +44,11 @@ class User(Base):
     phone_verified = Column(Boolean, default=False)
     phone_verifications = relationship("PhoneVerification", back_populates="user")
 
+    __table_args__ = (
+        # Member pages of general groups in join (signup) order
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
     @staticmethod
     def generate_username() -> str:
         """Generate a random username with 2 letters and 3 digits."""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -32,6 +32,25 @@ class MessageInDBBase(MessageBase):
 class Message(MessageInDBBase):
     author: Optional[User] = None
 
+# A search hit: the message plus an HTML snippet with matches in <mark> tags
+class MessageSearchResult(Message):
+    snippet: str
+
+# Read position reported by a client
+class ReadMarkerUpdate(BaseModel):
+    message_id: UUID
+
+# Unread messages in one channel
+class ChannelUnread(BaseModel):
+    channel_id: UUID
+    group_id: UUID
+    unread_count: int
+    last_read_message_id: Optional[UUID] = None
+
+class UnreadCounts(BaseModel):
+    total: int
+    channels: List[ChannelUnread]
+
 # Additional properties stored in DB
 class MessageInDB(MessageInDBBase):
     pass
\ No newline at end of file
@@ -0,0 +1,303 @@
+import abc
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# An envelope is the unit carried between workers:
+# {"channel_id": str, "message": dict, "exclude_user_id": str | None, "origin": str,
+#  "record": dict | None}
+# `record` is server-side data about the event (e.g. the full serialized
+# message for caches) that is never sent to clients.
+Envelope = Dict[str, Any]
+Handler = Callable[[Envelope], Awaitable[None]]
+
+
+class Broker(abc.ABC):
+    """
+    Base class for chat pub/sub backends.
+
+    Every worker publishes the events it produces and receives the events
+    produced by every worker (including itself) through its handler, which
+    delivers them to the sockets that worker holds.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def publish(
+        self, channel_id: str, message: Dict[str, Any], exclude_user_id: Optional[str] = None,
+        record: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Deliver an event to every worker, this one included."""
+
+    def _envelope(
+        self, channel_id: str, message: Dict[str, Any], exclude_user_id: Optional[str],
+        record: Optional[Dict[str, Any]] = None
+    ) -> Envelope:
+        return {
+            "channel_id": channel_id,
+            "message": message,
+            "exclude_user_id": exclude_user_id,
+            "origin": self.worker_id,
+            "record": record
+        }
+
+    async def _dispatch(self, envelope: Envelope) -> None:
+        if self._handler is None:
+            return
+        try:
+            await self._handler(envelope)
+        except Exception as e:
+            logger.error(f"Error delivering broker event: {e}")
+
+
+class InProcessBroker(Broker):
+    """
+    Delivers events straight to this process. Only correct with one worker.
+    """
+
+    async def publish(
+        self, channel_id: str, message: Dict[str, Any], exclude_user_id: Optional[str] = None,
+        record: Optional[Dict[str, Any]] = None
+    ) -> None:
+        await self._dispatch(self._envelope(channel_id, message, exclude_user_id, record))
+
+
+class SQLiteBroker(Broker):
+    """
+    Fans events out between worker processes on one host through a shared
+    SQLite file. Each worker polls for rows newer than the last one it saw.
+    Meant for local development and tests, not production traffic.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._db = None
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        import aiosqlite
+
+        await super().start(handler)
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS broker_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "created_at REAL NOT NULL, "
+            "payload TEXT NOT NULL)"
+        )
+        await self._db.commit()
+        async with self._db.execute("SELECT COALESCE(MAX(id), 0) FROM broker_events") as cursor:
+            row = await cursor.fetchone()
+            self._last_id = row[0]
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._db:
+            await self._db.close()
+            self._db = None
+
+    async def publish(
+        self, channel_id: str, message: Dict[str, Any], exclude_user_id: Optional[str] = None,
+        record: Optional[Dict[str, Any]] = None
+    ) -> None:
+        payload = json.dumps(self._envelope(channel_id, message, exclude_user_id, record))
+        await self._db.execute(
+            "INSERT INTO broker_events (created_at, payload) VALUES (?, ?)",
+            (time.time(), payload)
+        )
+        await self._db.commit()
+
+    async def _poll_loop(self) -> None:
+        last_prune = time.time()
+        while True:
+            try:
+                async with self._db.execute(
+                    "SELECT id, payload FROM broker_events WHERE id > ? ORDER BY id",
+                    (self._last_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+                for row_id, payload in rows:
+                    self._last_id = row_id
+                    await self._dispatch(json.loads(payload))
+
+                now = time.time()
+                if now - last_prune > self.retention:
+                    await self._db.execute(
+                        "DELETE FROM broker_events WHERE created_at < ?",
+                        (now - self.retention,)
+                    )
+                    await self._db.commit()
+                    last_prune = now
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SQLite broker poll error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class PostgresBroker(Broker):
+    """
+    Fans events out between workers with PostgreSQL LISTEN/NOTIFY.
+
+    Publishing goes through the application's engine; each worker keeps one
+    dedicated asyncpg connection for LISTEN and reconnects if it drops.
+    NOTIFY payloads are capped at 8000 bytes by PostgreSQL, so a larger
+    event is written to `broker_payloads` in the same transaction and only
+    its row id is notified; receivers read the row back. Rows are pruned
+    after `retention` seconds.
+    """
+
+    CHANNEL = "strangers_chat_events"
+    MAX_PAYLOAD = 7999
+
+    def __init__(self, dsn: str, reconnect_delay: float = 2.0, retention: float = 60.0):
+        super().__init__()
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self.retention = retention
+        self._last_prune = time.time()
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._listen_task: Optional[asyncio.Task] = None
+        self._consume_task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        self._listen_task = asyncio.create_task(self._listen_loop())
+        self._consume_task = asyncio.create_task(self._consume_loop())
+
+    async def stop(self) -> None:
+        for task in (self._listen_task, self._consume_task):
+            if task:
+                task.cancel()
+        self._listen_task = self._consume_task = None
+
+    async def publish(
+        self, channel_id: str, message: Dict[str, Any], exclude_user_id: Optional[str] = None,
+        record: Optional[Dict[str, Any]] = None
+    ) -> None:
+        from sqlalchemy import text
+        from app.db.base import engine
+
+        payload = json.dumps(self._envelope(channel_id, message, exclude_user_id, record))
+        async with engine.connect() as conn:
+            if len(payload.encode("utf-8")) > self.MAX_PAYLOAD:
+                # NOTIFY is sent at commit, so the row is visible by the time it arrives
+                row_id = await conn.scalar(
+                    text("INSERT INTO broker_payloads (payload, created_at) VALUES (:payload, :now) RETURNING id"),
+                    {"payload": payload, "now": time.time()}
+                )
+                payload = json.dumps({"payload_id": row_id})
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.CHANNEL, "payload": payload}
+            )
+            await conn.commit()
+        await self._prune()
+
+    async def _prune(self) -> None:
+        from sqlalchemy import text
+        from app.db.base import engine
+
+        now = time.time()
+        if now - self._last_prune < self.retention:
+            return
+        self._last_prune = now
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text("DELETE FROM broker_payloads WHERE created_at < :cutoff"),
+                    {"cutoff": now - self.retention}
+                )
+        except Exception as e:
+            logger.error(f"Postgres broker payload pruning failed: {e}")
+
+    async def _load(self, payload_id: int) -> Optional[str]:
+        from sqlalchemy import text
+        from app.db.base import engine
+
+        async with engine.connect() as conn:
+            return await conn.scalar(
+                text("SELECT payload FROM broker_payloads WHERE id = :id"), {"id": payload_id}
+            )
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        # asyncpg invokes listeners synchronously; hand off to the consumer
+        # task so events are delivered one at a time, in NOTIFY order
+        self._queue.put_nowait(payload)
+
+    async def _listen_loop(self) -> None:
+        import asyncpg
+
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(self.CHANNEL, self._on_notify)
+                logger.info("Postgres broker listening")
+                while not conn.is_closed():
+                    await asyncio.sleep(self.reconnect_delay)
+            except asyncio.CancelledError:
+                if conn and not conn.is_closed():
+                    await conn.close()
+                raise
+            except Exception as e:
+                logger.error(f"Postgres broker listener error: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _consume_loop(self) -> None:
+        while True:
+            payload = await self._queue.get()
+            try:
+                envelope = json.loads(payload)
+                if "payload_id" in envelope:
+                    stored = await self._load(envelope["payload_id"])
+                    if stored is None:
+                        logger.error(f"Broker payload {envelope['payload_id']} is gone, dropping event")
+                        continue
+                    envelope = json.loads(stored)
+            except json.JSONDecodeError:
+                logger.error("Dropping malformed broker payload")
+                continue
+            except Exception as e:
+                logger.error(f"Failed to read stored broker payload: {e}")
+                continue
+            await self._dispatch(envelope)
+
+
+def create_broker() -> Broker:
+    """
+    Build the broker selected by settings.BROKER_BACKEND.
+    """
+    backend = settings.BROKER_BACKEND.lower()
+    if backend == "postgres":
+        dsn = settings.DATABASE_URL.replace("+asyncpg", "")
+        return PostgresBroker(dsn)
+    if backend == "sqlite":
+        return SQLiteBroker(settings.BROKER_SQLITE_PATH)
+    if backend != "memory":
+        logger.warning(f"Unknown BROKER_BACKEND '{settings.BROKER_BACKEND}', using in-process broker")
+    return InProcessBroker()
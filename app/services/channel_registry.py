@@ -0,0 +1,93 @@
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import async_session_factory
+from app.models.channel import Channel, ChannelType
+from app.services.broker import Envelope
+from app.services.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelInfo(NamedTuple):
+    """What the message paths need to know about a channel."""
+    id: UUID
+    group_id: UUID
+    name: str
+    type: ChannelType
+
+
+class ChannelRegistry:
+    """
+    Channel id -> (group_id, name, type) for every channel, held in memory
+    so authorizing a message read, post or socket does not query
+    `channels`. A channel never moves between groups, so entries only go
+    stale when a channel is renamed or deleted.
+
+    Warmed with all channels at startup; channels created since are
+    loaded on first use. Unknown ids are not remembered, so a channel
+    created on another worker is found as soon as it exists. The channel
+    endpoints call `changed` after updating or deleting one, which drops
+    the entry on every worker through the broker.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, ChannelInfo] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def warm(self) -> None:
+        async with async_session_factory() as db:
+            result = await db.execute(select(Channel.id, Channel.group_id, Channel.name, Channel.type))
+            for row in result.all():
+                self._channels[str(row.id)] = ChannelInfo(*row)
+        logger.info(f"Channel registry warmed with {len(self._channels)} channels")
+
+    async def get(self, db: AsyncSession, channel_id: UUID) -> Optional[ChannelInfo]:
+        info = self._channels.get(str(channel_id))
+        if info is not None:
+            self.hits += 1
+            return info
+        self.misses += 1
+        result = await db.execute(
+            select(Channel.id, Channel.group_id, Channel.name, Channel.type)
+            .where(Channel.id == channel_id)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        info = self._channels[str(channel_id)] = ChannelInfo(*row)
+        return info
+
+    def forget(self, channel_id: str) -> None:
+        self._channels.pop(channel_id, None)
+
+    async def changed(self, channel_id: UUID) -> None:
+        """Call after creating, updating or deleting a channel."""
+        self.forget(str(channel_id))
+        try:
+            # Not sent to any socket: `apply` consumes it on every worker
+            await manager.broadcast({"type": "channel_changed", "channel_id": str(channel_id)}, str(channel_id))
+        except Exception as e:
+            logger.error(f"Failed to publish channel change: {e}")
+
+    async def apply(self, envelope: Envelope) -> None:
+        """Broker listener: drop channels changed on other workers."""
+        if envelope["message"].get("type") != "channel_changed":
+            return
+        self.forget(envelope["channel_id"])
+        envelope["message"] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._channels),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+channel_registry = ChannelRegistry()
@@ -0,0 +1,358 @@
+from fastapi import WebSocket
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Set
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.services.broker import Broker, Envelope, create_broker
+from app.services.replay_buffer import REPLAYABLE_EVENTS, ReplayBuffer
+from app.services.wire_protocol import Frame, WireCodec, json_codec, negotiate
+
+logger = logging.getLogger(__name__)
+
+# Called with every envelope this worker receives, e.g. to keep caches current
+Listener = Callable[[Envelope], Awaitable[None]]
+# Called with (user_id, channel_ids) when a socket is dropped from the registry
+DisconnectListener = Callable[[str, List[str]], None]
+
+# Close code sent to clients that cannot keep up ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code sent to clients that stopped answering heartbeats ("going away")
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 1001
+
+
+class Connection:
+    """
+    One accepted WebSocket, the channels it is subscribed to and its bounded
+    outbound queue.
+
+    All writes go through the queue and are performed by a dedicated writer
+    task, so a slow client only delays itself. Frames are already-encoded
+    (text or bytes, depending on the codec negotiated for the socket),
+    letting a broadcast serialize its payload once per codec.
+    """
+
+    __slots__ = ("websocket", "user_id", "codec", "channels", "queue", "writer_task", "closed", "last_seen")
+
+    def __init__(self, websocket: WebSocket, user_id: str, max_queue: int, codec: WireCodec = json_codec):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.codec = codec
+        self.channels: Set[str] = set()
+        self.queue: "asyncio.Queue[Frame]" = asyncio.Queue(maxsize=max_queue)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+        # Monotonic time of the last frame received from the client
+        self.last_seen = time.monotonic()
+
+    def touch(self) -> None:
+        """Record that the client is alive (any frame, including a pong)."""
+        self.last_seen = time.monotonic()
+
+    def start(self) -> None:
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def enqueue(self, payload: Frame) -> bool:
+        """Queue an encoded frame. Returns False if the queue is full."""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """Encode and queue a frame meant for this connection only."""
+        return self.enqueue(self.codec.encode(message))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        if self.closed:
+            return
+        self._mark_closed()
+        await self._close_socket(code, reason)
+
+    def abort(self, code: int, reason: str = "") -> None:
+        """Close from synchronous code, e.g. in the middle of a fan-out."""
+        if self.closed:
+            return
+        self._mark_closed()
+        asyncio.create_task(self._close_socket(code, reason))
+
+    def _mark_closed(self) -> None:
+        self.closed = True
+        if self.writer_task and self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+
+    async def _close_socket(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                payload = await self.queue.get()
+                if isinstance(payload, bytes):
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending message to websocket: {e}")
+            # Closing makes the endpoint's receive loop exit and clean up
+            await self.close(code=1011)
+
+
+# Class to manage WebSocket connections for chat
+class ConnectionManager:
+    """
+    Tracks the sockets held by this worker and fans chat events out to them.
+
+    `broadcast` publishes through the broker so that every worker, not only
+    the one that produced the event, delivers it to its own sockets.
+
+    Connections are indexed by channel and by user in sets, and each
+    channel keeps a count of sockets per user, so joining, leaving and
+    listing a channel's users are O(1) per connection and the user list
+    has no duplicates when someone has several tabs open.
+
+    A socket can be half-open (e.g. a phone that lost signal) without any
+    send failing, so a heartbeat sweep runs every `heartbeat_interval`
+    seconds: connections that have been quiet for an interval get an
+    application-level ping, and those silent for `heartbeat_timeout` are
+    closed and dropped from the registry. Clients answer with a pong, and
+    any other frame counts as a sign of life too.
+    """
+
+    def __init__(
+        self, broker: Broker, replay: ReplayBuffer, send_queue_size: int = 256,
+        heartbeat_interval: float = 25.0, heartbeat_timeout: float = 60.0
+    ):
+        # channel_id -> connections subscribed to it
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        # user_id -> that user's open connections
+        self.user_connections: Dict[str, Set[Connection]] = {}
+        # channel_id -> user_id -> number of that user's connections in the channel
+        self.channel_users: Dict[str, Dict[str, int]] = {}
+        self.broker = broker
+        self.replay = replay
+        self.send_queue_size = send_queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.slow_consumers_dropped = 0
+        self._listeners: List[Listener] = []
+        self._disconnect_listeners: List[DisconnectListener] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+        # Heartbeat gauges, as of the last sweep
+        self.idle_connections = 0
+        self.pings_sent = 0
+        self.connections_reaped = 0
+
+    def add_listener(self, listener: Listener) -> None:
+        """
+        Run `listener` for every broker event delivered to this worker,
+        before it reaches sockets. A listener may replace
+        `envelope["message"]` to change what local sockets receive, or set
+        it to None to send them nothing.
+        """
+        self._listeners.append(listener)
+
+    def add_disconnect_listener(self, listener: DisconnectListener) -> None:
+        """
+        Run `listener` with the user id and the channels a socket was in
+        whenever one is dropped, whether the client left or was reaped.
+        """
+        self._disconnect_listeners.append(listener)
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver)
+        if self.heartbeat_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self.broker.stop()
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> Connection:
+        """
+        Accept a socket, negotiating its wire encoding from the
+        subprotocols it offered. It receives nothing until it subscribes
+        to a channel.
+        """
+        offered = websocket.scope.get("subprotocols") or []
+        codec = negotiate(offered)
+        await websocket.accept(subprotocol=codec.subprotocol if codec.subprotocol in offered else None)
+        connection = Connection(websocket, user_id, self.send_queue_size, codec)
+        connection.start()
+        self.user_connections.setdefault(user_id, set()).add(connection)
+        logger.info(f"WebSocket connected for user {user_id}")
+        return connection
+
+    def subscribe(self, connection: Connection, channel_id: str) -> bool:
+        """Start delivering a channel's events. Returns False if already subscribed."""
+        if channel_id in connection.channels:
+            return False
+        connection.channels.add(channel_id)
+        self.active_connections.setdefault(channel_id, set()).add(connection)
+        users = self.channel_users.setdefault(channel_id, {})
+        users[connection.user_id] = users.get(connection.user_id, 0) + 1
+        return True
+
+    def unsubscribe(self, connection: Connection, channel_id: str) -> bool:
+        """Stop delivering a channel's events. Returns False if not subscribed."""
+        if channel_id not in connection.channels:
+            return False
+        connection.channels.discard(channel_id)
+        connections = self.active_connections[channel_id]
+        connections.discard(connection)
+        if not connections:
+            del self.active_connections[channel_id]
+
+        users = self.channel_users[channel_id]
+        remaining = users[connection.user_id] - 1
+        if remaining:
+            users[connection.user_id] = remaining
+        else:
+            del users[connection.user_id]
+            if not users:
+                del self.channel_users[channel_id]
+        return True
+
+    def disconnect(self, connection: Connection) -> List[str]:
+        """
+        Drop a socket from every channel. Returns the channels it was
+        subscribed to. Safe to call again for a socket already dropped.
+        """
+        connections = self.user_connections.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return []
+        channels = list(connection.channels)
+        for channel_id in channels:
+            self.unsubscribe(connection, channel_id)
+        connections.discard(connection)
+        if not connections:
+            del self.user_connections[connection.user_id]
+        if connection.writer_task:
+            connection.writer_task.cancel()
+        logger.info(f"WebSocket disconnected for user {connection.user_id}")
+
+        for listener in self._disconnect_listeners:
+            try:
+                listener(connection.user_id, channels)
+            except Exception as e:
+                logger.error(f"Disconnect listener failed: {e}")
+        return channels
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self._sweep()
+            except Exception as e:
+                logger.error(f"Heartbeat sweep failed: {e}")
+
+    def _sweep(self) -> None:
+        """Ping quiet connections and reap the ones that stopped answering."""
+        now = time.monotonic()
+        idle = 0
+        dead = []
+        for connections in self.user_connections.values():
+            for connection in connections:
+                quiet = now - connection.last_seen
+                if quiet >= self.heartbeat_timeout:
+                    dead.append(connection)
+                elif quiet >= self.heartbeat_interval:
+                    idle += 1
+                    connection.send({"type": "ping"})
+                    self.pings_sent += 1
+        self.idle_connections = idle
+
+        # Dropping here rather than waiting for the endpoint keeps dead
+        # sockets out of broadcasts even if closing a half-open socket hangs
+        for connection in dead:
+            logger.info(f"Reaping unresponsive WebSocket for user {connection.user_id}")
+            self.connections_reaped += 1
+            connection.abort(HEARTBEAT_TIMEOUT_CLOSE_CODE, "Heartbeat timeout")
+            self.disconnect(connection)
+
+    async def broadcast(self, message: dict, channel_id: str, exclude_user_id: str = None, record: dict = None):
+        """Broadcast message to all connections in a channel on every worker, optionally excluding a user"""
+        await self.broker.publish(channel_id, message, exclude_user_id, record)
+
+    async def _deliver(self, envelope: Envelope):
+        """Queue a broker event on this worker's connections in the channel"""
+        channel_id = envelope["channel_id"]
+        exclude_user_id = envelope.get("exclude_user_id")
+        message = envelope["message"]
+
+        # Sequence and buffer replayable events even with no local
+        # subscribers, so clients reconnecting here can catch up
+        if message.get("type") in REPLAYABLE_EVENTS:
+            envelope["message"] = self.replay.record(channel_id, message)
+
+        for listener in self._listeners:
+            try:
+                await listener(envelope)
+            except Exception as e:
+                logger.error(f"Broker listener failed: {e}")
+            if envelope["message"] is None:
+                break
+        message = envelope["message"]
+
+        connections = self.active_connections.get(channel_id)
+        if not connections or message is None:
+            return
+
+        # Serialize once per encoding, then hand the same frame to every writer
+        payloads: Dict[str, Frame] = {}
+        slow = []
+        for connection in connections:
+            # Skip the user who sent the message to avoid duplication
+            if exclude_user_id and connection.user_id == exclude_user_id:
+                continue
+            payload = payloads.get(connection.codec.name)
+            if payload is None:
+                payload = payloads[connection.codec.name] = connection.codec.encode(message)
+            if not connection.enqueue(payload):
+                slow.append(connection)
+
+        # Drop consumers whose queue overflowed rather than stall the channel.
+        # Closing ends the endpoint's receive loop, which then disconnects it.
+        for connection in slow:
+            logger.warning(f"Dropping slow WebSocket consumer {connection.user_id} in channel {channel_id}")
+            self.slow_consumers_dropped += 1
+            connection.abort(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer")
+
+    def get_connected_users(self, channel_id: str) -> List[str]:
+        """Get the distinct user IDs connected to a channel on this worker"""
+        return list(self.channel_users.get(channel_id, ()))
+
+    def is_user_connected(self, user_id: str) -> bool:
+        return user_id in self.user_connections
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.user_connections.values())
+
+    def heartbeat_stats(self) -> Dict[str, Any]:
+        return {
+            "live": self.connection_count(),
+            "idle": self.idle_connections,
+            "pings_sent": self.pings_sent,
+            "reaped": self.connections_reaped
+        }
+
+
+manager = ConnectionManager(
+    create_broker(),
+    ReplayBuffer(size=settings.REPLAY_BUFFER_SIZE, max_channels=settings.REPLAY_MAX_CHANNELS),
+    send_queue_size=settings.WS_SEND_QUEUE_SIZE,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+    heartbeat_timeout=settings.WS_HEARTBEAT_TIMEOUT_SECONDS
+)
@@ -0,0 +1,99 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.crud import group as crud_group
+from app.services.broker import Envelope
+from app.services.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipService:
+    """
+    Answers "is this user a member of this group?" for authorization with
+    an EXISTS probe of the user_group primary key (or, for a virtual
+    general group, of the user being an implied member), so the cost does
+    not depend on the size of the group.
+
+    Positive answers are kept for `ttl` seconds in an LRU of at most
+    `max_entries`. Negative answers are not cached: nothing has to be
+    invalidated when someone joins, whichever code path adds the row.
+    Removals (leaving, deleting a group or an account) must call
+    `changed`, which drops the entries on this worker and, through the
+    broker, on every other one.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (user_id, group_id) -> expiry (monotonic time)
+        self._members: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def is_member(self, db: AsyncSession, user_id: UUID, group_id: UUID) -> bool:
+        key = (str(user_id), str(group_id))
+        expires_at = self._members.get(key)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                self._members.move_to_end(key)
+                self.hits += 1
+                return True
+            del self._members[key]
+        self.misses += 1
+
+        if not await crud_group.is_member(db, group_id, user_id):
+            return False
+        self._members[key] = time.monotonic() + self.ttl
+        if len(self._members) > self.max_entries:
+            self._members.popitem(last=False)
+        return True
+
+    def invalidate(self, group_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """Forget a membership, every member of a group, or every group of a user."""
+        if group_id is not None and user_id is not None:
+            self._members.pop((user_id, group_id), None)
+            return
+        for key in [key for key in self._members if key[1] == group_id or key[0] == user_id]:
+            del self._members[key]
+
+    async def changed(self, group_id: Optional[UUID] = None, user_id: Optional[UUID] = None) -> None:
+        """Call after removing memberships; pass None for "all" on either side."""
+        message = {
+            "type": "membership_changed",
+            "group_id": str(group_id) if group_id else None,
+            "user_id": str(user_id) if user_id else None
+        }
+        self.invalidate(message["group_id"], message["user_id"])
+        try:
+            # Not sent to any socket: `apply` consumes it on every worker
+            await manager.broadcast(message, f"group:{message['group_id'] or '*'}")
+        except Exception as e:
+            logger.error(f"Failed to publish membership change: {e}")
+
+    async def apply(self, envelope: Envelope) -> None:
+        """Broker listener: drop memberships removed on other workers."""
+        message = envelope["message"]
+        if message.get("type") != "membership_changed":
+            return
+        self.invalidate(message.get("group_id"), message.get("user_id"))
+        envelope["message"] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._members),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+membership = MembershipService(
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+    max_entries=settings.MEMBERSHIP_CACHE_SIZE
+)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.crud import message_archive as crud_archive
+from app.db.base import async_session_factory
+from app.models.channel import Channel
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageArchiver:
+    """
+    Periodically moves messages older than `max_age_days` out of the
+    `messages` table into compressed archive segments of up to
+    `segment_size` messages, so the live table and its indexes only hold
+    recent history. History reads page into the archive transparently.
+
+    Archived messages can no longer be edited or found by search, but are
+    still read, exported, deleted one by one (which rewrites their
+    segment) and purged with their author's account. Every worker runs the job;
+    `archive_oldest_messages` detects two workers moving the same
+    messages and keeps only one copy.
+    """
+
+    def __init__(self, max_age_days: int = 90, segment_size: int = 500, interval: float = 3600.0):
+        self.max_age_days = max_age_days
+        self.segment_size = segment_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.runs = 0
+        self.messages_archived = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self) -> None:
+        if self.max_age_days > 0:
+            self._task = asyncio.create_task(self._archive_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _archive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Message archival failed: {e}")
+
+    async def run(self) -> int:
+        """Archive every channel's expired messages. Returns how many were moved."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.max_age_days)
+        moved = 0
+        async with async_session_factory() as db:
+            # One index probe per channel on (channel_id, created_at, id)
+            has_expired = (
+                select(Message.id)
+                .where(Message.channel_id == Channel.id, Message.created_at < cutoff)
+                .exists()
+            )
+            result = await db.execute(select(Channel.id).where(has_expired))
+            channel_ids = result.scalars().all()
+
+            for channel_id in channel_ids:
+                while True:
+                    count = await crud_archive.archive_oldest_messages(
+                        db, channel_id, cutoff, self.segment_size
+                    )
+                    if count == 0:
+                        break
+                    moved += count
+
+        self.runs += 1
+        self.messages_archived += moved
+        self.last_run_at = datetime.now(timezone.utc)
+        if moved:
+            logger.info(f"Archived {moved} messages from {len(channel_ids)} channels")
+        return moved
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.max_age_days > 0,
+            "runs": self.runs,
+            "messages_archived": self.messages_archived,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None
+        }
+
+
+message_archiver = MessageArchiver(
+    max_age_days=settings.ARCHIVE_AFTER_DAYS,
+    segment_size=settings.ARCHIVE_SEGMENT_SIZE,
+    interval=settings.ARCHIVE_INTERVAL_SECONDS
+)
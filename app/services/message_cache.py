@@ -0,0 +1,137 @@
+from bisect import insort
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+from app.config import settings
+from app.services.broker import Envelope
+
+
+class CachedMessage(NamedTuple):
+    """
+    A cached message: its (created_at, id) sort key and the serialized
+    message exactly as `read_messages` returns it. Having `created_at` and
+    `id` lets it be passed to `encode_cursor` like a Message row.
+    """
+    created_at: datetime
+    id: UUID
+    record: Dict[str, Any]
+
+
+class ChannelMessages:
+    __slots__ = ("messages", "complete")
+
+    def __init__(self, messages: List[CachedMessage], complete: bool):
+        # Oldest first, sorted by (created_at, id) like the history query
+        self.messages = messages
+        # True when the channel holds no messages beyond these
+        self.complete = complete
+
+
+def _cached(record: Dict[str, Any]) -> CachedMessage:
+    return CachedMessage(
+        datetime.fromisoformat(record["created_at"]), UUID(str(record["id"])), record
+    )
+
+
+class RecentMessageCache:
+    """
+    The newest `size` serialized messages of recently opened channels, so
+    the first history page of a busy channel is served from memory.
+
+    A channel is cached the first time its first page is read from the
+    database and is kept current from broker delivery: `new_message`
+    envelopes carry the full serialized message as `record`, updates are
+    patched in place and deletions removed. Channels beyond `max_channels`
+    are evicted least recently used first.
+
+    A fill is only stored if no event reached the channel while the query
+    ran (checked with a per-channel version), so a slow read never
+    overwrites a newer message.
+    """
+
+    def __init__(self, size: int = 100, max_channels: int = 1000):
+        self.size = size
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[str, ChannelMessages]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, channel_id: str, limit: int) -> Optional[List[CachedMessage]]:
+        """The newest `limit` messages, newest first, or None on a miss."""
+        cached = self._channels.get(channel_id)
+        if cached is None or limit > self.size or (
+            limit > len(cached.messages) and not cached.complete
+        ):
+            self.misses += 1
+            return None
+        self._channels.move_to_end(channel_id)
+        self.hits += 1
+        return cached.messages[::-1][:limit]
+
+    def version(self, channel_id: str) -> int:
+        return self._versions.get(channel_id, 0)
+
+    def fill(self, channel_id: str, records: List[Dict[str, Any]], version: int) -> None:
+        """
+        Store the newest messages of a channel, newest first as queried,
+        unless the channel changed since `version` was read.
+        """
+        if self.version(channel_id) != version:
+            return
+        messages = sorted(_cached(record) for record in records[:self.size])
+        self._channels[channel_id] = ChannelMessages(messages, complete=len(records) < self.size)
+        self._channels.move_to_end(channel_id)
+        while len(self._channels) > self.max_channels:
+            self._channels.popitem(last=False)
+
+    def invalidate(self, channel_id: str) -> None:
+        self._versions[channel_id] = self.version(channel_id) + 1
+        self._channels.pop(channel_id, None)
+
+    async def apply(self, envelope: Envelope) -> None:
+        """Broker listener: keep cached channels in step with message events."""
+        message = envelope["message"]
+        event = message.get("type")
+        if event not in ("new_message", "message_update", "message_delete", "messages_purged"):
+            return
+        channel_id = envelope["channel_id"]
+        self._versions[channel_id] = self.version(channel_id) + 1
+        cached = self._channels.get(channel_id)
+        if cached is None:
+            return
+
+        if event == "new_message":
+            record = envelope.get("record")
+            if record is None:
+                self.invalidate(channel_id)
+                return
+            insort(cached.messages, _cached(record))
+            if len(cached.messages) > self.size:
+                del cached.messages[0]
+                cached.complete = False
+        elif event == "message_update":
+            for entry in cached.messages:
+                if entry.record["id"] == message["id"]:
+                    entry.record["content"] = message["content"]
+                    entry.record["updated_at"] = message.get("updated_at")
+                    break
+        elif event == "message_delete":
+            cached.messages = [entry for entry in cached.messages if entry.record["id"] != message["id"]]
+        else:
+            self.invalidate(channel_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._channels),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+recent_messages = RecentMessageCache(
+    size=settings.RECENT_MESSAGES_CACHE_SIZE,
+    max_channels=settings.RECENT_MESSAGES_CACHE_CHANNELS
+)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.db.base import async_session_factory
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """
+    Group-commit writer for chat ingestion.
+
+    Messages submitted within `max_delay` seconds of each other (or until
+    `max_batch` accumulate) are written with a single multi-row
+    INSERT ... RETURNING in one transaction. Each submitter is resumed only
+    once its batch has committed, so acknowledging after `submit` returns
+    means the message is durable.
+
+    If the batch fails (say one message's channel was deleted meanwhile),
+    its rows are retried one transaction each, so only the bad ones fail.
+    """
+
+    def __init__(self, max_batch: int = 256, max_delay: float = 0.005):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._batch_started: float = 0.0
+        self._timer: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+        # Stats
+        self.batches = 0
+        self.messages = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    async def submit(self, content: str, author_id: UUID, channel_id: UUID) -> Message:
+        """
+        Queue a message and wait until the batch containing it is committed.
+        Returns a detached Message carrying the stored id and created_at.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        row = {
+            "id": uuid.uuid4(),
+            "content": content,
+            "author_id": author_id,
+            "channel_id": channel_id,
+            # Stamped here, not by the server default: PostgreSQL's now() is the
+            # transaction time, which would give a whole batch one timestamp
+            # and order it by id on the (created_at, id) history key
+            "created_at": datetime.now(timezone.utc)
+        }
+        if not self._pending:
+            self._batch_started = time.perf_counter()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def stop(self) -> None:
+        """Write whatever is pending and wait for in-flight batches."""
+        if self._pending:
+            self._flush_now()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "pending": len(self._pending),
+            "failed": self.failed,
+            "avg_batch_size": round(self.messages / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch_seen,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 2) if self.batches else 0,
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        if self._pending:
+            self._flush_now()
+
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._write(batch, self._batch_started))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]], started: float) -> None:
+        try:
+            created = await self._insert([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Message write failed: {e}")
+                self.failed += 1
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            logger.error(f"Message batch of {len(batch)} failed, retrying one by one: {e}")
+            created = {}
+            for row, future in batch:
+                try:
+                    created.update(await self._insert([row]))
+                except Exception as e:
+                    logger.error(f"Message write failed: {e}")
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+            batch = [(row, future) for row, future in batch if row["id"] in created]
+            if not batch:
+                return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.messages += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        for row, future in batch:
+            if future.done():
+                continue
+            try:
+                future.set_result(Message(**{**row, "created_at": created.get(row["id"])}))
+            except Exception as e:
+                future.set_exception(e)
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> Dict[UUID, datetime]:
+        """Insert rows in one transaction. Returns message id -> stored created_at."""
+        async with async_session_factory() as db:
+            result = await db.execute(
+                insert(Message.__table__)
+                .values(rows)
+                .returning(Message.__table__.c.id, Message.__table__.c.created_at)
+            )
+            created = {row.id: row.created_at for row in result}
+            await db.commit()
+        return created
+
+
+message_writer = MessageWriter(
+    max_batch=settings.MESSAGE_WRITER_MAX_BATCH,
+    max_delay=settings.MESSAGE_WRITER_MAX_DELAY_MS / 1000
+)
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.broker import Envelope
+from app.services.connection_manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceService:
+    """
+    Who is online in each channel, counted in users rather than sockets.
+
+    Locally, a user is online in a channel while this worker holds at least
+    one of their sockets subscribed to it (the manager's per-channel user
+    refcounts, so extra tabs change nothing). Going offline is debounced by
+    `grace` seconds, so a reconnecting client or a quick channel switch
+    back does not flap. Only these transitions are broadcast, as
+    `user_connected` / `user_disconnected` events carrying the user_id.
+
+    Every worker applies those events from the broker, keyed by the worker
+    that sent them, which gives each one the same cluster-wide view without
+    extra queries: a user is online while any worker reports them.
+
+    A worker that dies never sends its offline events, so every worker
+    also publishes a heartbeat each `heartbeat_interval` seconds. Users
+    reported by a worker not heard from in `heartbeat_misses` intervals
+    are dropped.
+    """
+
+    HEARTBEAT_CHANNEL = "presence:heartbeat"
+
+    def __init__(
+        self, connections: ConnectionManager, grace: float = 5.0,
+        heartbeat_interval: float = 10.0, heartbeat_misses: int = 3
+    ):
+        self.connections = connections
+        self.grace = grace
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_misses = heartbeat_misses
+        self._task: Optional[asyncio.Task] = None
+        # worker id -> when anything from it last arrived (monotonic time)
+        self._last_seen: Dict[str, float] = {}
+        self.workers_expired = 0
+        # channel_id -> user_id -> workers reporting the user online
+        self._online: Dict[str, Dict[str, Set[str]]] = {}
+        self._usernames: Dict[str, str] = {}
+        # (channel_id, user_id) -> pending offline transition on this worker
+        self._pending_offline: Dict[Tuple[str, str], asyncio.Task] = {}
+        # (channel_id, user_id) announced online by this worker
+        self._announced: Dict[Tuple[str, str], str] = {}
+
+    async def joined(self, channel_id: str, user_id: str, username: str) -> None:
+        """Call after subscribing a socket; announces the user if they just came online."""
+        key = (channel_id, user_id)
+        pending = self._pending_offline.pop(key, None)
+        if pending is not None:
+            # Back within the grace period: they never went offline
+            pending.cancel()
+        if key in self._announced:
+            return
+        self._announced[key] = username
+        await self.connections.broadcast({
+            "type": "user_connected",
+            "user": username,
+            "user_id": user_id,
+            "channel_id": channel_id
+        }, channel_id, exclude_user_id=user_id)
+
+    def left(self, channel_id: str, user_id: str) -> None:
+        """Call after unsubscribing a socket; schedules the offline transition if it was the last one."""
+        key = (channel_id, user_id)
+        if user_id in self.connections.channel_users.get(channel_id, ()):
+            return
+        if key not in self._announced or key in self._pending_offline:
+            return
+        self._pending_offline[key] = asyncio.create_task(self._go_offline(key))
+
+    def disconnected(self, user_id: str, channel_ids: List[str]) -> None:
+        """Disconnect listener: a socket in `channel_ids` is gone."""
+        for channel_id in channel_ids:
+            self.left(channel_id, user_id)
+
+    async def _go_offline(self, key: Tuple[str, str]) -> None:
+        await asyncio.sleep(self.grace)
+        self._pending_offline.pop(key, None)
+        await self._announce_offline(key)
+
+    async def _announce_offline(self, key: Tuple[str, str]) -> None:
+        channel_id, user_id = key
+        username = self._announced.pop(key, None)
+        if username is None:
+            return
+        await self.connections.broadcast({
+            "type": "user_disconnected",
+            "user": username,
+            "user_id": user_id,
+            "channel_id": channel_id
+        }, channel_id)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        """Report everyone this worker announced as offline, e.g. on shutdown."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._pending_offline.values():
+            task.cancel()
+        self._pending_offline.clear()
+        for key in list(self._announced):
+            try:
+                await self._announce_offline(key)
+            except Exception as e:
+                logger.error(f"Failed to publish offline presence: {e}")
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                # Not sent to any socket: `apply` consumes it on every worker
+                await self.connections.broadcast({"type": "presence_heartbeat"}, self.HEARTBEAT_CHANNEL)
+            except Exception as e:
+                logger.error(f"Failed to publish presence heartbeat: {e}")
+            self._expire_workers()
+
+    def _expire_workers(self) -> None:
+        """Forget the users of every worker that has missed too many heartbeats."""
+        cutoff = time.monotonic() - self.heartbeat_interval * self.heartbeat_misses
+        dead = {
+            origin for origin, seen_at in self._last_seen.items()
+            if seen_at < cutoff and origin != self.connections.broker.worker_id
+        }
+        if not dead:
+            return
+        for origin in dead:
+            del self._last_seen[origin]
+            logger.warning(f"Worker {origin} missed its presence heartbeats, dropping its users")
+        self.workers_expired += len(dead)
+        for channel_id, users in list(self._online.items()):
+            for user_id, origins in list(users.items()):
+                origins -= dead
+                if not origins:
+                    del users[user_id]
+            if not users:
+                del self._online[channel_id]
+
+    async def apply(self, envelope: Envelope) -> None:
+        """Broker listener: track presence transitions and liveness of every worker."""
+        origin = envelope.get("origin")
+        if origin:
+            self._last_seen[origin] = time.monotonic()
+        message = envelope["message"]
+        event = message.get("type")
+        if event not in ("user_connected", "user_disconnected") or not message.get("user_id"):
+            return
+        channel_id = envelope["channel_id"]
+        user_id = message["user_id"]
+
+        if event == "user_connected":
+            self._online.setdefault(channel_id, {}).setdefault(user_id, set()).add(origin)
+            self._usernames[user_id] = message.get("user")
+            return
+
+        users = self._online.get(channel_id)
+        if not users or user_id not in users:
+            return
+        users[user_id].discard(origin)
+        if not users[user_id]:
+            del users[user_id]
+            if not users:
+                del self._online[channel_id]
+
+    def online_user_ids(self, channel_id: str) -> List[str]:
+        return list(self._online.get(channel_id, ()))
+
+    def channel_presence(self, channel_ids: List[str]) -> Dict[str, Any]:
+        """Online users for each of `channel_ids`, plus the distinct total."""
+        channels = []
+        everyone: Set[str] = set()
+        for channel_id in channel_ids:
+            user_ids = self._online.get(channel_id, {})
+            everyone.update(user_ids)
+            channels.append({
+                "channel_id": channel_id,
+                "online_count": len(user_ids),
+                "users": [
+                    {"id": user_id, "username": self._usernames.get(user_id)}
+                    for user_id in user_ids
+                ]
+            })
+        return {"online_count": len(everyone), "channels": channels}
+
+
+presence = PresenceService(
+    manager,
+    grace=settings.PRESENCE_OFFLINE_GRACE_SECONDS,
+    heartbeat_interval=settings.PRESENCE_HEARTBEAT_SECONDS,
+    heartbeat_misses=settings.PRESENCE_HEARTBEAT_MISSES
+)
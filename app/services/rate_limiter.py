@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, func, update
+
+from app.config import settings
+from app.db.base import engine
+from app.models.rate_limit import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Base class for token-bucket rate limiting backends.
+
+    A bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second; every accepted action takes one token.
+    """
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take a token from `key`'s bucket. Returns 0 if allowed, otherwise
+        the number of seconds until a token is available.
+        """
+        raise NotImplementedError
+
+    async def refund(self, key: str, rate: float, burst: float) -> None:
+        """Give back a token taken by `acquire`, e.g. when a later check refused the action."""
+        raise NotImplementedError
+
+    async def prune(self, refill_seconds: float) -> int:
+        """
+        Drop buckets untouched for `refill_seconds`, which have refilled
+        completely and so are the same as absent ones. Returns how many
+        were dropped.
+        """
+        return 0
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Buckets held in this process. Limits are per worker, so with several
+    workers a client gets up to that many times the configured rate.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at, time at which the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return (1 - tokens) / rate
+        tokens -= 1
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0.0
+
+    async def refund(self, key: str, rate: float, burst: float) -> None:
+        if key not in self._buckets:
+            return
+        now = time.monotonic()
+        tokens, updated_at, _ = self._buckets[key]
+        tokens = min(burst, tokens + (now - updated_at) * rate + 1)
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+
+    async def prune(self, refill_seconds: float) -> int:
+        before = len(self._buckets)
+        self._prune(time.monotonic())
+        return before - len(self._buckets)
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely is the same as an absent one
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Buckets in the `rate_limit_buckets` table, so limits hold across
+    workers. Each check is a single atomic upsert:
+
+        INSERT ... ON CONFLICT (key) DO UPDATE ... RETURNING tokens, updated_at
+
+    which refills and takes a token in one round trip without explicit
+    locking. A refused attempt leaves the row untouched, so the outcome is
+    read from whether `updated_at` came back as this call's timestamp.
+    """
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        table = RateLimitBucket.__table__
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            least = func.least
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+            # SQLite's multi-argument min() is scalar
+            least = func.min
+
+        # Column references in SET are the row's values before the update
+        refill = least(burst, table.c.tokens + (now - table.c.updated_at) * rate)
+        allowed = refill >= 1
+        stmt = (
+            insert(table)
+            .values(key=key, tokens=burst - 1, updated_at=now)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "tokens": case((allowed, refill - 1), else_=table.c.tokens),
+                "updated_at": case((allowed, now), else_=table.c.updated_at)
+            }
+        ).returning(table.c.tokens, table.c.updated_at)
+
+        async with engine.begin() as conn:
+            tokens, updated_at = (await conn.execute(stmt)).one()
+        if updated_at == now:
+            return 0.0
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        return (1 - tokens) / rate
+
+    async def refund(self, key: str, rate: float, burst: float) -> None:
+        table = RateLimitBucket.__table__
+        least = func.least if engine.dialect.name == "postgresql" else func.min
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(table)
+                .where(table.c.key == key)
+                .values(tokens=least(burst, table.c.tokens + 1))
+            )
+
+    async def prune(self, refill_seconds: float) -> int:
+        table = RateLimitBucket.__table__
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                delete(table).where(table.c.updated_at < time.time() - refill_seconds)
+            )
+        return result.rowcount
+
+
+def create_rate_limiter() -> RateLimiter:
+    backend = settings.RATE_LIMIT_BACKEND.lower()
+    if backend == "database":
+        return DatabaseRateLimiter()
+    if backend != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{backend}', using in-memory rate limiting")
+    return MemoryRateLimiter()
+
+
+class MessageRateLimits:
+    """
+    Limits on message ingestion, applied to both the WebSocket and REST
+    paths: a per-user bucket (one client flooding) and a per-channel bucket
+    (many clients flooding one channel).
+
+    Every `prune_interval` seconds, buckets that have had time to refill
+    completely are dropped from the limiter so the database backend's
+    table only holds recently active users and channels.
+    """
+
+    def __init__(
+        self, limiter: RateLimiter,
+        user_rate: float, user_burst: float,
+        channel_rate: float, channel_burst: float,
+        prune_interval: float = 300.0
+    ):
+        self.limiter = limiter
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.prune_interval = prune_interval
+        self._task: Optional[asyncio.Task] = None
+        self.limited = 0
+        self.pruned = 0
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for the slowest bucket to refill from empty."""
+        return max(self.user_burst / self.user_rate, self.channel_burst / self.channel_rate)
+
+    def start(self) -> None:
+        if self.prune_interval > 0:
+            self._task = asyncio.create_task(self._prune_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _prune_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                self.pruned += await self.limiter.prune(self.refill_seconds)
+            except Exception as e:
+                logger.error(f"Rate limit bucket pruning failed: {e}")
+
+    async def check(self, user_id: str, channel_id: str) -> float:
+        """
+        Returns 0 if the user may post to the channel now, else seconds to
+        wait. A post refused by the channel bucket costs the user nothing.
+        """
+        user_key = f"user:{user_id}"
+        retry_after = await self.limiter.acquire(user_key, self.user_rate, self.user_burst)
+        if not retry_after:
+            retry_after = await self.limiter.acquire(
+                f"channel:{channel_id}", self.channel_rate, self.channel_burst
+            )
+            if retry_after:
+                await self.limiter.refund(user_key, self.user_rate, self.user_burst)
+        if retry_after:
+            self.limited += 1
+        return retry_after
+
+
+message_limits = MessageRateLimits(
+    create_rate_limiter(),
+    user_rate=settings.RATE_LIMIT_USER_PER_SECOND,
+    user_burst=settings.RATE_LIMIT_USER_BURST,
+    channel_rate=settings.RATE_LIMIT_CHANNEL_PER_SECOND,
+    channel_burst=settings.RATE_LIMIT_CHANNEL_BURST,
+    prune_interval=settings.RATE_LIMIT_PRUNE_INTERVAL_SECONDS
+)
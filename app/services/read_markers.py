@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, select, tuple_
+
+from app.config import settings
+from app.db.base import async_session_factory, engine
+from app.models.message import Message
+from app.models.read_marker import ChannelReadMarker
+
+logger = logging.getLogger(__name__)
+
+
+class ReadMarkerBuffer:
+    """
+    Coalesces read-marker updates in memory.
+
+    Clients report the newest message they have seen as they scroll, which
+    can be many times a second. Only the latest report per (user, channel)
+    is kept, and every `flush_interval` seconds the pending markers are
+    written in one executemany upsert. The upsert resolves the message's
+    sort key in SQL and only ever moves a marker forward, so a stale tab
+    cannot mark a channel unread again.
+    """
+
+    def __init__(self, flush_interval: float = 2.0):
+        self.flush_interval = flush_interval
+        # (user_id, channel_id) -> id of the last message read
+        self._pending: Dict[Tuple[UUID, UUID], UUID] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Stats
+        self.reports = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the timer and write whatever is pending."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def mark(self, user_id: UUID, channel_id: UUID, message_id: UUID) -> None:
+        """Record that the user has read the channel up to `message_id`."""
+        self.reports += 1
+        self._pending[(user_id, channel_id)] = message_id
+
+    def has_pending(self, user_id: UUID) -> bool:
+        return any(key[0] == user_id for key in self._pending)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Read marker flush failed: {e}")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            rows = [
+                {"b_user_id": user_id, "b_channel_id": channel_id, "b_message_id": message_id}
+                for (user_id, channel_id), message_id in batch.items()
+            ]
+            try:
+                async with async_session_factory() as db:
+                    await db.execute(_upsert_statement(), rows)
+                    await db.commit()
+            except Exception:
+                # Keep the batch unless newer reports replaced it meanwhile
+                for key, message_id in batch.items():
+                    self._pending.setdefault(key, message_id)
+                raise
+            self.flushes += 1
+            self.rows_written += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reports": self.reports,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written
+        }
+
+
+def _upsert_statement():
+    """
+    INSERT ... SELECT FROM messages ... ON CONFLICT DO UPDATE, advancing
+    the marker only if the new message sorts after the stored one. A
+    message id from another channel (or a deleted message) selects no row
+    and is ignored.
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = ChannelReadMarker.__table__
+    source = (
+        select(
+            bindparam("b_user_id", type_=table.c.user_id.type),
+            Message.channel_id,
+            Message.created_at,
+            Message.id,
+            func.now()
+        )
+        .where(Message.id == bindparam("b_message_id", type_=Message.id.type))
+        .where(Message.channel_id == bindparam("b_channel_id", type_=Message.channel_id.type))
+    )
+    stmt = insert(table).from_select(
+        ["user_id", "channel_id", "last_read_at", "last_read_message_id", "updated_at"], source
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.channel_id],
+        set_={
+            "last_read_at": stmt.excluded.last_read_at,
+            "last_read_message_id": stmt.excluded.last_read_message_id,
+            "updated_at": stmt.excluded.updated_at
+        },
+        where=(
+            tuple_(stmt.excluded.last_read_at, stmt.excluded.last_read_message_id)
+            > tuple_(table.c.last_read_at, table.c.last_read_message_id)
+        )
+    )
+
+
+read_markers = ReadMarkerBuffer(flush_interval=settings.READ_MARKER_FLUSH_SECONDS)
@@ -0,0 +1,65 @@
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+import uuid
+
+# Events a reconnecting client needs to catch up on; presence and typing
+# are transient and are not replayed
+REPLAYABLE_EVENTS = {"new_message", "message_update", "message_delete"}
+
+
+class ReplayBuffer:
+    """
+    Per-channel sequence numbers plus a bounded ring buffer of recent events.
+
+    Every replayable event delivered on this worker is stamped with the next
+    `seq` for its channel. A client that reconnects with the last `seq` it
+    saw (and this worker's `epoch`) gets the missed events straight from
+    memory; `since` returns None when the gap is no longer covered, and the
+    caller falls back to the database.
+
+    Sequence counters are tiny and kept for every channel seen; only the
+    event buffers are evicted (least recently used first) beyond
+    `max_channels`, so numbering never restarts within an epoch.
+    """
+
+    def __init__(self, size: int = 256, max_channels: int = 5000):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.size = size
+        self.max_channels = max_channels
+        self._seq: Dict[str, int] = {}
+        self._events: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+
+    def record(self, channel_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp an event with its channel sequence number and buffer it."""
+        seq = self._seq.get(channel_id, 0) + 1
+        self._seq[channel_id] = seq
+        message = {**message, "seq": seq}
+
+        events = self._events.get(channel_id)
+        if events is None:
+            events = deque(maxlen=self.size)
+            self._events[channel_id] = events
+            if len(self._events) > self.max_channels:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(channel_id)
+        events.append(message)
+        return message
+
+    def current_seq(self, channel_id: str) -> int:
+        return self._seq.get(channel_id, 0)
+
+    def since(self, channel_id: str, last_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Events after `last_seq`, or None if the buffer no longer covers the gap.
+        """
+        current = self._seq.get(channel_id, 0)
+        if last_seq == current:
+            return []
+        if last_seq > current:
+            # Numbering from another epoch; nothing here is comparable
+            return None
+        events = self._events.get(channel_id)
+        if not events or events[0]["seq"] > last_seq + 1:
+            return None
+        return [event for event in events if event["seq"] > last_seq]
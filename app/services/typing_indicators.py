@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.broker import Envelope
+from app.services.connection_manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTypers:
+    __slots__ = ("users", "dirty", "published_at")
+
+    def __init__(self):
+        # user_id -> (username, expires_at)
+        self.users: Dict[str, Tuple[str, float]] = {}
+        self.dirty = False
+        self.published_at = 0.0
+
+
+class TypingAggregator:
+    """
+    Coalesces typing indicators into one `typing_users` event per channel
+    per tick instead of rebroadcasting every client frame.
+
+    Typing frames only update this worker's per-channel state; a typer
+    expires `ttl` seconds after their last frame. Every `interval` the
+    ticker publishes the state of channels that changed (and re-publishes
+    non-empty ones every ttl/2 so other workers do not expire them).
+
+    Each worker publishes only its own typers. The broker listener merges
+    the latest state from every origin and rewrites the event so sockets
+    receive the full list for the channel, and only when that list changed.
+    """
+
+    def __init__(self, connections: ConnectionManager, interval: float = 0.5, ttl: float = 5.0):
+        self.connections = connections
+        self.interval = interval
+        self.ttl = ttl
+        self._local: Dict[str, LocalTypers] = {}
+        # channel_id -> origin -> (users, received_at)
+        self._remote: Dict[str, Dict[str, Tuple[List[Dict[str, str]], float]]] = {}
+        # channel_id -> user ids in the last list sent to sockets
+        self._sent: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.frames_in = 0
+        self.events_out = 0
+        self.naive_socket_frames = 0
+        self.socket_frames = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._tick_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def update(self, channel_id: str, user_id: str, username: str, is_typing: bool) -> None:
+        """Record a typing frame from a socket on this worker."""
+        self.frames_in += 1
+        # Rebroadcasting the frame would have reached everyone else here
+        connected = self.connections.channel_users.get(channel_id, {})
+        self.naive_socket_frames += len(self.connections.active_connections.get(channel_id, ())) - connected.get(user_id, 0)
+
+        if is_typing:
+            state = self._local.setdefault(channel_id, LocalTypers())
+            if user_id not in state.users:
+                state.dirty = True
+            state.users[user_id] = (username, time.monotonic() + self.ttl)
+        else:
+            self.clear(channel_id, user_id)
+
+    def clear(self, channel_id: str, user_id: str) -> None:
+        """Stop showing a user as typing, e.g. when they leave the channel."""
+        state = self._local.get(channel_id)
+        if state and state.users.pop(user_id, None) is not None:
+            state.dirty = True
+
+    def disconnected(self, user_id: str, channel_ids: List[str]) -> None:
+        """Disconnect listener: a socket in `channel_ids` is gone."""
+        for channel_id in channel_ids:
+            self.clear(channel_id, user_id)
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"Typing tick failed: {e}")
+
+    async def _tick(self) -> None:
+        now = time.monotonic()
+        for channel_id, state in list(self._local.items()):
+            expired = [user_id for user_id, (_, expires_at) in state.users.items() if expires_at <= now]
+            for user_id in expired:
+                del state.users[user_id]
+                state.dirty = True
+
+            refresh = state.users and now - state.published_at >= self.ttl / 2
+            if state.dirty or refresh:
+                state.dirty = False
+                state.published_at = now
+                self.events_out += 1
+                await self.connections.broadcast({
+                    "type": "typing_users",
+                    "channel_id": channel_id,
+                    "users": [
+                        {"id": user_id, "username": username}
+                        for user_id, (username, _) in state.users.items()
+                    ]
+                }, channel_id)
+            if not state.users and not state.dirty:
+                del self._local[channel_id]
+
+    async def apply(self, envelope: Envelope) -> None:
+        """
+        Broker listener: merge a worker's typing state into the channel's
+        and hand sockets the combined list.
+        """
+        message = envelope["message"]
+        if message.get("type") != "typing_users":
+            return
+        channel_id = envelope["channel_id"]
+        now = time.monotonic()
+
+        origins = self._remote.setdefault(channel_id, {})
+        if message["users"]:
+            origins[envelope.get("origin")] = (message["users"], now)
+        else:
+            origins.pop(envelope.get("origin"), None)
+
+        merged: Dict[str, Dict[str, str]] = {}
+        for origin, (users, received_at) in list(origins.items()):
+            # A worker that stopped refreshing (e.g. died) no longer counts
+            if now - received_at > self.ttl:
+                del origins[origin]
+                continue
+            for user in users:
+                merged[user["id"]] = user
+        if not origins:
+            del self._remote[channel_id]
+
+        user_ids = sorted(merged)
+        if user_ids == self._sent.get(channel_id, []):
+            # A refresh from some worker; sockets already have this list
+            envelope["message"] = None
+            return
+        if user_ids:
+            self._sent[channel_id] = user_ids
+        else:
+            self._sent.pop(channel_id, None)
+        envelope["message"] = {**message, "users": list(merged.values())}
+        self.socket_frames += len(self.connections.active_connections.get(channel_id, ()))
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self.naive_socket_frames - self.socket_frames
+        return {
+            "frames_in": self.frames_in,
+            "events_out": self.events_out,
+            "socket_frames_naive": self.naive_socket_frames,
+            "socket_frames_sent": self.socket_frames,
+            "socket_frames_saved": saved,
+            "saved_ratio": round(saved / self.naive_socket_frames, 3) if self.naive_socket_frames else 0
+        }
+
+
+typing_indicators = TypingAggregator(
+    manager,
+    interval=settings.TYPING_TICK_MS / 1000,
+    ttl=settings.TYPING_TTL_SECONDS
+)
@@ -0,0 +1,191 @@
+import abc
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# What travels over the socket: text for JSON, bytes for binary encodings
+Frame = Union[str, bytes]
+
+JSON_SUBPROTOCOL = "strangers.json.v1"
+MSGPACK_SUBPROTOCOL = "strangers.msgpack.v1"
+
+# Short codes for the keys every event repeats. Keys without a code are sent as-is.
+FIELD_CODES = {
+    "type": "t",
+    "channel_id": "c",
+    "channel_ids": "cs",
+    "id": "i",
+    "content": "b",
+    "author": "a",
+    "author_id": "ai",
+    "username": "n",
+    "user": "u",
+    "user_id": "ui",
+    "users": "us",
+    "connected_users": "cu",
+    "created_at": "ca",
+    "updated_at": "ua",
+    "tempId": "k",
+    "is_typing": "ty",
+    "seq": "s",
+    "epoch": "e",
+    "last_seq": "ls",
+    "last_message_id": "lm",
+    "last_created_at": "lc",
+    "events": "ev",
+    "source": "so",
+    "complete": "cp",
+    "retry_after": "ra",
+    "message": "m",
+    "message_id": "mi"
+}
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+# Event types are sent as small integers. Append only: codes are part of the protocol.
+TYPE_CODES = {
+    name: code for code, name in enumerate([
+        "new_message", "message_sent", "message_update", "message_delete",
+        "typing", "typing_users", "user_connected", "user_disconnected",
+        "subscribe", "unsubscribe", "subscribed", "unsubscribed", "replay",
+        "connection_established", "rate_limited", "error", "ping", "pong",
+        "messages_purged", "read"
+    ])
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+# Fields (or lists, e.g. connected_users) holding UUIDs, sent as 16 raw bytes
+UUID_FIELDS = {"id", "channel_id", "channel_ids", "author_id", "user_id", "connected_users", "last_message_id", "message_id"}
+
+
+class FrameDecodeError(ValueError):
+    pass
+
+
+class WireCodec(abc.ABC):
+    """
+    How a connection's frames are encoded. A broadcast encodes its event
+    once per codec in use, not once per socket.
+    """
+
+    name = ""
+    # Human readable name for error messages
+    label = ""
+    subprotocol: Optional[str] = None
+
+    @abc.abstractmethod
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        """Encode an event for the socket."""
+
+    @abc.abstractmethod
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        """Decode a client frame; raises FrameDecodeError if malformed."""
+
+
+class JsonCodec(WireCodec):
+    """JSON text frames with full field names: the default, and what old clients speak."""
+
+    name = "json"
+    label = "JSON"
+    subprotocol = JSON_SUBPROTOCOL
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        return json.dumps(message)
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        try:
+            message = json.loads(frame)
+        except (TypeError, ValueError) as e:
+            raise FrameDecodeError(str(e))
+        if not isinstance(message, dict):
+            raise FrameDecodeError("Frame is not an object")
+        return message
+
+
+class MsgpackCodec(WireCodec):
+    """
+    MessagePack binary frames. Keys use FIELD_CODES, event types TYPE_CODES
+    and UUIDs their 16-byte form; decoding reverses all three, so the rest
+    of the server only ever sees the JSON-shaped dicts.
+    """
+
+    name = "msgpack"
+    label = "MessagePack"
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def __init__(self):
+        import msgpack
+
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        return self._packb(_compact(message))
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        if isinstance(frame, str):
+            raise FrameDecodeError("Expected a binary frame")
+        try:
+            message = self._unpackb(frame, strict_map_key=False)
+        except Exception as e:
+            raise FrameDecodeError(str(e))
+        if not isinstance(message, dict):
+            raise FrameDecodeError("Frame is not a map")
+        return _expand(message)
+
+
+def _compact(value: Any, key: Optional[str] = None) -> Any:
+    if isinstance(value, dict):
+        return {FIELD_CODES.get(k, k): _compact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(item, key) for item in value]
+    if key == "type" and value in TYPE_CODES:
+        return TYPE_CODES[value]
+    if key in UUID_FIELDS and isinstance(value, str) and len(value) == 36:
+        # Much cheaper than uuid.UUID(value).bytes, which dominates encode time
+        try:
+            return bytes.fromhex(value.replace("-", ""))
+        except ValueError:
+            return value
+    return value
+
+
+def _expand(value: Any, key: Optional[str] = None) -> Any:
+    if isinstance(value, dict):
+        expanded = {}
+        for k, v in value.items():
+            name = FIELD_NAMES.get(k, k)
+            expanded[name] = _expand(v, name)
+        return expanded
+    if isinstance(value, list):
+        return [_expand(item, key) for item in value]
+    if key == "type" and isinstance(value, int):
+        return TYPE_NAMES.get(value, value)
+    if isinstance(value, bytes) and len(value) == 16:
+        return str(uuid.UUID(bytes=value))
+    return value
+
+
+json_codec = JsonCodec()
+
+# Binary encodings are optional: offered only if their library is installed
+_codecs: Dict[str, WireCodec] = {JSON_SUBPROTOCOL: json_codec}
+try:
+    _codecs[MSGPACK_SUBPROTOCOL] = MsgpackCodec()
+except ImportError:
+    logger.info("msgpack is not installed, the MessagePack wire protocol is disabled")
+
+
+def negotiate(offered: List[str]) -> WireCodec:
+    """
+    Pick the codec for a new socket from the subprotocols the client
+    offered, in the client's order of preference. Clients that offer none
+    get plain JSON.
+    """
+    for subprotocol in offered:
+        codec = _codecs.get(subprotocol)
+        if codec is not None:
+            return codec
+    return json_codec
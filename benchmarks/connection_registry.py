@@ -0,0 +1,134 @@
+"""
+Microbenchmark: the in-memory connection registry at 50k connections.
+
+Simulates N sockets (fake WebSocket objects, no network) spread over users
+and channels, then measures the cost of joining, broadcasting to and
+leaving channels through ConnectionManager, plus memory per connection.
+Runs without a server or database.
+
+Usage:
+    python benchmarks/connection_registry.py --connections 50000 \\
+        --channels 500 --tabs 2
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.broker import InProcessBroker  # noqa: E402
+from app.services.connection_manager import ConnectionManager  # noqa: E402
+from app.services.replay_buffer import ReplayBuffer  # noqa: E402
+
+
+class FakeWebSocket:
+    __slots__ = ()
+    # No subprotocols offered: the manager falls back to JSON
+    scope = {}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, payload):
+        pass
+
+    async def send_bytes(self, payload):
+        pass
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def per_op(label: str, seconds: float, ops: int) -> None:
+    print(f"{label:<28} {ops:>8} ops  {seconds * 1e6 / ops:8.2f} us/op")
+
+
+async def connect_all(manager, args):
+    connections = []
+    for i in range(args.connections):
+        # `tabs` sockets per user
+        user_id = f"user-{i // args.tabs}"
+        connections.append(await manager.connect(FakeWebSocket(), user_id))
+    return connections
+
+
+def subscribe_all(manager, connections, channel_ids, args):
+    # Every socket of a user goes to the same channel
+    for i, connection in enumerate(connections):
+        manager.subscribe(connection, channel_ids[(i // args.tabs) % args.channels])
+
+
+async def main(args):
+    manager = ConnectionManager(InProcessBroker(), ReplayBuffer(), send_queue_size=args.queue_size)
+    await manager.start()
+    channel_ids = [f"channel-{i}" for i in range(args.channels)]
+    # As timeit does: keep collections of the 50k tasks/queues out of the timings
+    gc.disable()
+
+    start = time.perf_counter()
+    connections = await connect_all(manager, args)
+    per_op("connect", time.perf_counter() - start, len(connections))
+
+    start = time.perf_counter()
+    subscribe_all(manager, connections, channel_ids, args)
+    per_op("subscribe", time.perf_counter() - start, len(connections))
+
+    start = time.perf_counter()
+    for channel_id in channel_ids:
+        manager.get_connected_users(channel_id)
+    per_op("get_connected_users", time.perf_counter() - start, len(channel_ids))
+
+    start = time.perf_counter()
+    for channel_id in channel_ids:
+        await manager.broadcast({"type": "typing", "user": "bench", "is_typing": True}, channel_id)
+    elapsed = time.perf_counter() - start
+    per_op("broadcast (per channel)", elapsed, len(channel_ids))
+    per_op("broadcast (per recipient)", elapsed, len(connections))
+
+    # Let the writer tasks drain what was queued
+    await asyncio.sleep(0)
+    while any(not connection.queue.empty() for connection in connections):
+        await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    for i, connection in enumerate(connections):
+        manager.unsubscribe(connection, channel_ids[(i // args.tabs) % args.channels])
+    per_op("unsubscribe", time.perf_counter() - start, len(connections))
+
+    subscribe_all(manager, connections, channel_ids, args)
+    start = time.perf_counter()
+    for connection in connections:
+        manager.disconnect(connection)
+    per_op("disconnect", time.perf_counter() - start, len(connections))
+    assert not manager.active_connections and not manager.user_connections
+    await asyncio.sleep(0)
+
+    # Memory in a separate pass: tracing slows everything allocated under it
+    del connections
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    connections = await connect_all(manager, args)
+    subscribe_all(manager, connections, channel_ids, args)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'memory per connection':<28} {(after - before) / len(connections):8.0f} bytes "
+          f"(queue, writer task, indexes)")
+
+    for connection in connections:
+        manager.disconnect(connection)
+    await asyncio.sleep(0)
+    await manager.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=50000)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--tabs", type=int, default=2, help="sockets per user")
+    parser.add_argument("--queue-size", type=int, default=256)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,156 @@
+"""
+Benchmark: general groups over N users.
+
+Builds a throwaway SQLite database with N active users, then:
+
+- times creating a general group the old way, which appended every user
+  to `Group.members`, and through `crud.group.create_group`, which makes
+  it virtual and writes no memberships
+- creates `--general` general groups and reports the user_group rows they
+  take (N per group before, none now), with the latency of counting
+  their members and checking a membership
+
+Reports latency and peak Python memory per call (latency is measured
+with tracemalloc running, which inflates both paths).
+
+Usage:
+    python benchmarks/general_group.py --users 100000 --general 3 --repeat 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "general_group.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import delete, func, insert  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+
+from app.crud import group as crud_group  # noqa: E402
+from app.db.base import Base, async_session_factory, engine  # noqa: E402
+from app.models.channel import Channel, ChannelType  # noqa: E402
+from app.models.group import Group  # noqa: E402
+from app.models.invitation import Invitation  # noqa: E402,F401
+from app.models.message import Message  # noqa: E402,F401
+from app.models.phone_verification import PhoneVerification  # noqa: E402,F401
+from app.models.user import User, user_group  # noqa: E402
+from app.schemas.group import GroupCreate  # noqa: E402
+
+
+async def populate(args) -> uuid.UUID:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    async with async_session_factory() as db:
+        for start in range(0, args.users, 5000):
+            await db.execute(insert(User), [
+                {"id": user_id, "email": f"user{start + i}@example.com", "username": f"user{start + i}", "is_active": True}
+                for i, user_id in enumerate(user_ids[start:start + 5000])
+            ])
+        await db.commit()
+    return user_ids[0]
+
+
+async def old_create_group(db, group_in, owner_id):
+    owner = await db.get(User, owner_id)
+    db_group = Group(name=group_in.name, is_general=group_in.is_general, owner_id=owner_id)
+    db_group.members.append(owner)
+    result = await db.execute(select(User).where(User.is_active == True))  # noqa: E712
+    for user in result.scalars().all():
+        if user.id != owner_id:
+            db_group.members.append(user)
+    db.add(db_group)
+    await db.flush()
+    db.add(Channel(name="general", type=ChannelType.GENERAL, group_id=db_group.id))
+    await db.commit()
+    await db.refresh(db_group, attribute_names=['owner', 'members', 'channels'])
+    return db_group
+
+
+async def timed(fn, *args):
+    async with async_session_factory() as db:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = await fn(db, *args)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+async def drop_group(group_id):
+    async with async_session_factory() as db:
+        await db.execute(delete(user_group).where(user_group.c.group_id == group_id))
+        await db.execute(delete(Channel).where(Channel.group_id == group_id))
+        await db.execute(delete(Group).where(Group.id == group_id))
+        await db.commit()
+
+
+async def count_rows(group_id) -> int:
+    async with async_session_factory() as db:
+        return await db.scalar(select(func.count()).where(user_group.c.group_id == group_id))
+
+
+async def bench_create(label, fn, owner_id, repeat):
+    timings, peaks, rows = [], [], 0
+    for i in range(repeat):
+        group_in = GroupCreate(name=f"Everyone {i}", is_general=True)
+        group, elapsed, peak = await timed(fn, group_in, owner_id)
+        timings.append(elapsed)
+        peaks.append(peak)
+        rows = await count_rows(group.id)
+        await drop_group(group.id)
+    print(f"{label:<44} {min(timings) * 1000:9.1f} ms {max(peaks) / 1e6:9.1f} MB   user_group rows {rows}")
+
+
+async def bench_reads(label, fn, repeat):
+    timings, peaks = [], []
+    for _ in range(repeat):
+        result, elapsed, peak = await timed(fn)
+        timings.append(elapsed)
+        peaks.append(peak)
+    print(f"{label:<44} {min(timings) * 1000:9.1f} ms {max(peaks) / 1e6:9.1f} MB   {result}")
+
+
+async def main(args):
+    print(f"Populating {args.users} users in {DB_PATH} ...")
+    owner_id = await populate(args)
+
+    print("Create a general group:")
+    await bench_create("members.append per user", old_create_group, owner_id, args.repeat)
+    await bench_create("crud.group.create_group (virtual)", crud_group.create_group, owner_id, args.repeat)
+
+    general_ids = []
+    async with async_session_factory() as db:
+        for i in range(args.general):
+            group = await crud_group.create_group(db, GroupCreate(name=f"General {i}", is_general=True), owner_id)
+            general_ids.append(group.id)
+        rows = await db.scalar(select(func.count()).select_from(user_group))
+    print(f"{args.general} general groups: {rows} user_group rows (previously {args.general * args.users})")
+
+    async def counts(db):
+        return sorted((await crud_group.get_member_counts(db, general_ids)).values())
+
+    async def check(db):
+        return await crud_group.is_member(db, general_ids[-1], owner_id)
+
+    await bench_reads("get_member_counts", counts, args.repeat)
+    await bench_reads("is_member", check, args.repeat)
+
+    await engine.dispose()
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--general", type=int, default=3, help="general groups to create")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
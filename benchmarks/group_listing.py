@@ -0,0 +1,124 @@
+"""
+Benchmark: listing a user's groups when one of them is a general group.
+
+Builds a throwaway SQLite database with N users, one general group
+created through `crud.group.create_group` (so every user is an implied
+member) and a few small groups of the benchmarked user, then times
+`GET /groups`' query path two ways: `crud.group.get_user_groups`, which
+loads owners and takes `member_count` from one grouped COUNT, and the old
+one, which selectinloaded every group's members. The old path only sees
+stored memberships, so it is timed after writing the N user_group rows
+the general group used to take.
+Reports latency and peak Python memory per call (latency is measured
+with tracemalloc running, which inflates both paths).
+
+Usage:
+    python benchmarks/group_listing.py --users 100000 --groups 5 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "group_listing.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app.crud import group as crud_group  # noqa: E402
+from app.db.base import Base, async_session_factory, engine  # noqa: E402
+from app.models.channel import Channel  # noqa: E402,F401
+from app.models.group import Group  # noqa: E402
+from app.models.invitation import Invitation  # noqa: E402,F401
+from app.models.message import Message  # noqa: E402,F401
+from app.models.phone_verification import PhoneVerification  # noqa: E402,F401
+from app.models.user import User, user_group  # noqa: E402
+from app.schemas.group import GroupCreate  # noqa: E402
+
+
+async def populate(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    me = user_ids[0]
+    small = [uuid.uuid4() for _ in range(args.groups)]
+    async with async_session_factory() as db:
+        for start in range(0, args.users, 5000):
+            await db.execute(insert(User), [
+                {"id": user_id, "email": f"user{start + i}@example.com", "username": f"user{start + i}", "is_active": True}
+                for i, user_id in enumerate(user_ids[start:start + 5000])
+            ])
+        await db.execute(insert(Group), [
+            {"id": group_id, "name": f"Meetup {i}", "is_general": False, "owner_id": me}
+            for i, group_id in enumerate(small)
+        ])
+        await db.execute(insert(user_group), [
+            {"user_id": user_id, "group_id": group_id}
+            for group_id in small for user_id in user_ids[:8]
+        ])
+        await db.commit()
+        general = await crud_group.create_group(db, GroupCreate(name="Everyone", is_general=True), me)
+    return me, general.id, user_ids
+
+
+async def store_general_members(general, user_ids):
+    """Write the user_group rows a general group took before it was virtual."""
+    async with async_session_factory() as db:
+        for start in range(0, len(user_ids), 5000):
+            await db.execute(insert(user_group), [
+                {"user_id": user_id, "group_id": general} for user_id in user_ids[start:start + 5000]
+            ])
+        await db.commit()
+
+
+async def old_user_groups(db, user_id):
+    result = await db.execute(
+        select(Group)
+        .where(Group.members.any(User.id == user_id))
+        .options(selectinload(Group.owner), selectinload(Group.members))
+    )
+    return [(group, len(group.members)) for group in result.scalars().all()]
+
+
+async def new_user_groups(db, user_id):
+    return [(group, group.member_count) for group in await crud_group.get_user_groups(db, user_id)]
+
+
+async def measure(label, fn, user_id, repeat):
+    timings, peaks = [], []
+    for _ in range(repeat):
+        async with async_session_factory() as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            groups = await fn(db, user_id)
+            timings.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    counts = sorted(count for _, count in groups)
+    print(f"{label:<34} {min(timings) * 1000:9.1f} ms {max(peaks) / 1e6:9.1f} MB   member counts {counts}")
+
+
+async def main(args):
+    print(f"Populating {args.users} users in {DB_PATH} ...")
+    me, general, user_ids = await populate(args)
+    await measure("get_user_groups + grouped COUNT", new_user_groups, me, args.repeat)
+    await store_general_members(general, user_ids)
+    await measure("selectinload(Group.members)", old_user_groups, me, args.repeat)
+    await engine.dispose()
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--groups", type=int, default=5, help="small groups of the benchmarked user")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""
+Benchmark: listing the members of a group with N members.
+
+Builds a throwaway SQLite database with N users who are all members of
+one regular group (N user_group rows) and, implicitly, of one general
+group, then times `GET /groups/{id}/members`' query path two ways: the
+old one, which selectinloaded `group.members` and returned all of them,
+and `crud.group.get_group_members`, which reads one keyset page. Pages
+are timed at the start and after walking `--depth` pages in, for both
+orders and for a username prefix. Reports latency and peak Python memory
+per call (latency is measured with tracemalloc running).
+
+Usage:
+    python benchmarks/member_listing.py --users 100000 --limit 50 --depth 20 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "member_listing.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app.crud import group as crud_group  # noqa: E402
+from app.db.base import Base, async_session_factory, engine  # noqa: E402
+from app.models.channel import Channel  # noqa: E402,F401
+from app.models.group import Group  # noqa: E402
+from app.models.invitation import Invitation  # noqa: E402,F401
+from app.models.message import Message  # noqa: E402,F401
+from app.models.phone_verification import PhoneVerification  # noqa: E402,F401
+from app.models.user import User, user_group  # noqa: E402
+
+
+async def populate(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    regular, general = uuid.uuid4(), uuid.uuid4()
+    start_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    async with async_session_factory() as db:
+        for start in range(0, args.users, 5000):
+            await db.execute(insert(User), [
+                {
+                    "id": user_id, "email": f"user{start + i}@example.com",
+                    "username": f"U{(start + i) * 7919 % args.users:06d}", "is_active": True,
+                    "created_at": start_time + timedelta(seconds=start + i)
+                }
+                for i, user_id in enumerate(user_ids[start:start + 5000])
+            ])
+        await db.execute(insert(Group), [
+            {"id": regular, "name": "Meetup", "is_general": False, "owner_id": user_ids[0]},
+            {"id": general, "name": "Everyone", "is_general": True, "owner_id": user_ids[0]}
+        ])
+        for start in range(0, args.users, 5000):
+            await db.execute(insert(user_group), [
+                {"user_id": user_id, "group_id": regular, "joined_at": start_time + timedelta(seconds=start + i)}
+                for i, user_id in enumerate(user_ids[start:start + 5000])
+            ])
+        await db.commit()
+    return regular, general
+
+
+async def old_members(db, group_id, **_):
+    result = await db.execute(
+        select(Group).where(Group.id == group_id).options(selectinload(Group.members))
+    )
+    group = result.scalars().first()
+    return [{"id": str(m.id), "username": m.username, "joined_at": None} for m in group.members]
+
+
+async def new_members(db, group_id, limit, order_by, prefix, after):
+    group = await crud_group.get_group_summary(db, group_id)
+    return await crud_group.get_group_members(db, group, limit=limit, order_by=order_by, prefix=prefix, after=after)
+
+
+async def cursor_after(group_id, limit, order_by, depth):
+    """The cursor a client holds after reading `depth` pages."""
+    after = None
+    async with async_session_factory() as db:
+        group = await crud_group.get_group_summary(db, group_id)
+        for _ in range(depth):
+            page = await crud_group.get_group_members(db, group, limit=limit, order_by=order_by, after=after)
+            after = crud_group.decode_member_cursor(crud_group.encode_member_cursor(page[-1], order_by), order_by)
+    return after
+
+
+async def measure(label, fn, group_id, repeat, **kwargs):
+    timings, peaks = [], []
+    for _ in range(repeat):
+        async with async_session_factory() as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            members = await fn(db, group_id, **kwargs)
+            timings.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    print(f"{label:<44} {min(timings) * 1000:9.1f} ms {max(peaks) / 1e6:9.1f} MB   {len(members)} members")
+
+
+async def main(args):
+    print(f"Populating {args.users} users in {DB_PATH} ...")
+    regular, general = await populate(args)
+    for name, group_id in (("regular group", regular), ("general group", general)):
+        print(f"{name}:")
+        if group_id == regular:
+            await measure("selectinload(Group.members)", old_members, group_id, args.repeat)
+        for order_by in crud_group.MEMBER_ORDERS:
+            for depth in (0, args.depth):
+                after = await cursor_after(group_id, args.limit, order_by, depth)
+                await measure(
+                    f"page by {order_by}, {depth} pages in", new_members, group_id, args.repeat,
+                    limit=args.limit, order_by=order_by, prefix=None, after=after
+                )
+        await measure(
+            "page by username, prefix 'U0999'", new_members, group_id, args.repeat,
+            limit=args.limit, order_by="username", prefix="U0999", after=None
+        )
+    await engine.dispose()
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=20, help="pages walked before the timed one")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
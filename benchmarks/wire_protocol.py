@@ -0,0 +1,121 @@
+"""
+Microbenchmark: WebSocket frame encodings.
+
+Encodes typical chat events with the default JSON path (json.dumps) and
+the MessagePack codec (short field codes, UUIDs as 16 bytes), and reports
+encode cost and bytes per frame, uncompressed and after permessage-deflate.
+Deflate is simulated with zlib the way the websockets library applies it:
+raw deflate, flushed per message, either keeping the compression context
+between messages (the default) or not (no_context_takeover).
+Runs without a server or database.
+
+Usage:
+    python benchmarks/wire_protocol.py --iterations 20000 --stream 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.wire_protocol import JsonCodec, MsgpackCodec  # noqa: E402
+
+
+CONTENT = [
+    "Anyone up for the meetup on Saturday? I can bring snacks.",
+    "haha yes",
+    "Just moved here from Pune, looking for people to play badminton with",
+    "Which cafe was that again?",
+    "I'll share the location in a bit, running late from work"
+]
+
+
+def sample_events(channel_id, users, n):
+    """The n-th event of each kind a channel would send."""
+    new_message = {
+        "type": "new_message",
+        "id": str(uuid.uuid4()),
+        "content": CONTENT[n % len(CONTENT)],
+        "author": users[n % len(users)],
+        "channel_id": channel_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "seq": 1000 + n
+    }
+    return {
+        "new_message": new_message,
+        "typing_users": {"type": "typing_users", "channel_id": channel_id, "users": users[n % 5:n % 5 + 2]},
+        "user_connected": {
+            "type": "user_connected", "user": users[n % len(users)]["username"],
+            "user_id": users[n % len(users)]["id"], "channel_id": channel_id
+        },
+        "subscribed": {
+            "type": "subscribed", "channel_id": channel_id, "epoch": "5f0c2a9e81d4",
+            "seq": 1000 + n, "connected_users": [user["id"] for user in users[n % 3:]]
+        },
+        "replay (20 messages)": {
+            "type": "replay", "channel_id": channel_id, "source": "memory", "complete": True,
+            "events": [
+                {**new_message, "id": str(uuid.uuid4()), "content": CONTENT[i % len(CONTENT)], "seq": n + i}
+                for i in range(20)
+            ]
+        }
+    }
+
+
+def deflated_size(frames, context_takeover: bool) -> float:
+    """Average compressed bytes per frame for a stream of frames."""
+    total = 0
+    compressor = zlib.compressobj(wbits=-15)
+    for frame in frames:
+        if not context_takeover:
+            compressor = zlib.compressobj(wbits=-15)
+        data = frame.encode("utf-8") if isinstance(frame, str) else frame
+        # The trailing empty block of a sync flush is not sent (RFC 7692)
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total / len(frames)
+
+
+def encode_cost(encode, event, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(event)
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+
+def main(args):
+    codecs = [("json.dumps", JsonCodec())]
+    try:
+        codecs.append(("msgpack", MsgpackCodec()))
+    except ImportError:
+        print("msgpack is not installed; only the JSON path is measured")
+
+    channel_id = str(uuid.uuid4())
+    users = [{"id": str(uuid.uuid4()), "username": f"stranger_{i}"} for i in range(20)]
+    # A stream of each kind of event, as a channel would send them
+    streams = {}
+    for n in range(args.stream):
+        for name, event in sample_events(channel_id, users, n).items():
+            streams.setdefault(name, []).append(event)
+
+    print(f"{'event':<22} {'codec':<11} {'us/encode':>9} {'bytes':>7} {'deflate':>8} {'deflate*':>9}")
+    for name, events in streams.items():
+        event = events[0]
+        for label, codec in codecs:
+            frame = codec.encode(event)
+            assert codec.decode(frame) == json.loads(json.dumps(event))
+            stream = [codec.encode(e) for e in events]
+            print(f"{name:<22} {label:<11} {encode_cost(codec.encode, event, args.iterations):9.2f} "
+                  f"{sum(map(len, stream)) / len(stream):7.0f} {deflated_size(stream, True):8.0f} {deflated_size(stream, False):9.0f}")
+    print("deflate: context kept between messages; deflate*: no_context_takeover")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--stream", type=int, default=200, help="frames per event kind for the size columns")
+    main(parser.parse_args())
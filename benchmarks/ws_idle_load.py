@@ -0,0 +1,106 @@
+"""
+Load test: hundreds of idle chat sockets alongside REST traffic.
+
+Opens N WebSockets to a running server and keeps them idle, then hammers a
+REST endpoint and reports throughput and latency. Run it once with no idle
+sockets for a baseline and once with several hundred: with the socket
+lifecycle holding no pooled DB connection the two runs should be close,
+where previously ~30 sockets exhausted the pool and stalled REST requests.
+
+Usage:
+    python benchmarks/ws_idle_load.py --base-url http://localhost:8000 \\
+        --token <JWT> --channel-id <UUID> --sockets 300 --duration 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import websockets
+
+
+async def open_idle_sockets(ws_url: str, count: int):
+    sockets = []
+    for _ in range(count):
+        try:
+            sockets.append(await websockets.connect(ws_url, open_timeout=10))
+        except Exception as e:
+            print(f"Socket {len(sockets) + 1} failed to open: {e}")
+            break
+    return sockets
+
+
+async def drain(sockets):
+    # Keep reading so server-side queues never fill up
+    async def reader(ws):
+        try:
+            async for _ in ws:
+                pass
+        except Exception:
+            pass
+    return [asyncio.create_task(reader(ws)) for ws in sockets]
+
+
+async def rest_load(client: httpx.AsyncClient, url: str, headers, duration: float, concurrency: int):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def main(args):
+    http_base = args.base_url.rstrip("/")
+    ws_base = http_base.replace("http://", "ws://").replace("https://", "wss://")
+    ws_url = f"{ws_base}/api/v1/messages/ws/{args.channel_id}?token={args.token}"
+    rest_url = f"{http_base}/api/v1/messages/channel/{args.channel_id}?limit=20"
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    print(f"Opening {args.sockets} idle sockets...")
+    sockets = await open_idle_sockets(ws_url, args.sockets)
+    readers = await drain(sockets)
+    print(f"{len(sockets)} sockets open")
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        latencies, errors = await rest_load(
+            client, rest_url, headers, args.duration, args.concurrency
+        )
+
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+    if not latencies:
+        print("No REST requests completed")
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"Idle sockets:      {len(sockets)}")
+    print(f"REST requests:     {len(latencies)} ({errors} errors)")
+    print(f"Throughput:        {len(latencies) / args.duration:.1f} req/s")
+    print(f"Latency p50 / p95: {statistics.median(latencies) * 1000:.1f} / {p95 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--channel-id", required=True)
+    parser.add_argument("--sockets", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))